@@ -2,10 +2,11 @@
 External service integrations for CareSetu Voice Agent
 """
 
-from .google_calendar_integration import GoogleCalendarIntegration
+from .google_calendar_integration import GoogleCalendarIntegration, AsyncGoogleCalendarIntegration
 from .crm_integration import CRMConnector as CRMIntegration
 
 __all__ = [
     'GoogleCalendarIntegration',
+    'AsyncGoogleCalendarIntegration',
     'CRMIntegration',
 ]
\ No newline at end of file
@@ -5,13 +5,22 @@ Simplified version - lets Google Calendar handle all notifications
 
 import os
 import json
+import time
+import uuid
+import asyncio
 import smtplib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Any
+from urllib.parse import quote, urlencode, urlsplit
+import aiohttp
+import httplib2
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
@@ -77,6 +86,8 @@ class GoogleCalendarIntegration:
             self.token_file = os.path.join(os.path.dirname(self.credentials_file), os.path.basename(token_file))
             print(f"Fallback token file at: {self.token_file}")
         self.service = None
+        # Per-thread authorized HTTP clients; httplib2 connections are not thread-safe
+        self._local = threading.local()
         self.calendar_id = 'primary'  # Use primary calendar by default
         
         # Business configuration
@@ -147,8 +158,16 @@ class GoogleCalendarIntegration:
             with open(self.token_file, 'w') as token:
                 token.write(creds.to_json())
         
+        self.credentials = creds
         self.service = build('calendar', 'v3', credentials=creds)
     
+    def _http(self) -> AuthorizedHttp:
+        """Get this thread's authorized HTTP client, keeping its connection alive between calls"""
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = self._local.http = AuthorizedHttp(self.credentials, http=httplib2.Http(timeout=10))
+        return http
+    
     def _send_confirmation_email(self, customer_name: str, customer_email: str, 
                                appointment_details: Dict[str, Any]) -> bool:
         """
@@ -302,19 +321,7 @@ class GoogleCalendarIntegration:
             List of available time slots
         """
         try:
-            # Parse date and set timezone
-            tz = pytz.timezone(self.business_hours['timezone'])
-            target_date = datetime.strptime(date, '%Y-%m-%d').replace(tzinfo=tz)
-            
-            # Set business hours for the day
-            start_time = target_date.replace(
-                hour=int(self.business_hours['start'].split(':')[0]),
-                minute=int(self.business_hours['start'].split(':')[1])
-            )
-            end_time = target_date.replace(
-                hour=int(self.business_hours['end'].split(':')[0]),
-                minute=int(self.business_hours['end'].split(':')[1])
-            )
+            start_time, end_time = self._business_window(date)
             
             # Get existing events for the day
             events_result = self.service.events().list(
@@ -323,41 +330,59 @@ class GoogleCalendarIntegration:
                 timeMax=end_time.isoformat(),
                 singleEvents=True,
                 orderBy='startTime'
-            ).execute()
+            ).execute(http=self._http())
             
             events = events_result.get('items', [])
+            return self._find_free_slots(events, start_time, end_time, duration_minutes)
             
-            # Find available slots
-            available_slots = []
-            current_time = start_time
-            
-            for event in events:
-                event_start = datetime.fromisoformat(event['start'].get('dateTime', event['start'].get('date')))
-                event_end = datetime.fromisoformat(event['end'].get('dateTime', event['end'].get('date')))
-                
-                # Check if there's a gap before this event
-                if (event_start - current_time).total_seconds() >= duration_minutes * 60:
-                    available_slots.append({
-                        'start_time': current_time.strftime('%H:%M'),
-                        'end_time': (current_time + timedelta(minutes=duration_minutes)).strftime('%H:%M'),
-                        'datetime': current_time.isoformat()
-                    })
-                
-                current_time = max(current_time, event_end)
+        except Exception as e:
+            print(f"Error checking availability: {e}")
+            return []
+    
+    def _business_window(self, date: str):
+        """Get the timezone-aware business-hours window for a YYYY-MM-DD date"""
+        tz = pytz.timezone(self.business_hours['timezone'])
+        target_date = datetime.strptime(date, '%Y-%m-%d').replace(tzinfo=tz)
+        
+        start_time = target_date.replace(
+            hour=int(self.business_hours['start'].split(':')[0]),
+            minute=int(self.business_hours['start'].split(':')[1])
+        )
+        end_time = target_date.replace(
+            hour=int(self.business_hours['end'].split(':')[0]),
+            minute=int(self.business_hours['end'].split(':')[1])
+        )
+        return start_time, end_time
+    
+    def _find_free_slots(self, events: List[Dict[str, Any]], start_time: datetime,
+                         end_time: datetime, duration_minutes: int) -> List[Dict[str, Any]]:
+        """Find gaps of at least duration_minutes between start-ordered events"""
+        available_slots = []
+        current_time = start_time
+        
+        for event in events:
+            event_start = datetime.fromisoformat(event['start'].get('dateTime', event['start'].get('date')))
+            event_end = datetime.fromisoformat(event['end'].get('dateTime', event['end'].get('date')))
             
-            # Check for slot after last event
-            if (end_time - current_time).total_seconds() >= duration_minutes * 60:
+            # Check if there's a gap before this event
+            if (event_start - current_time).total_seconds() >= duration_minutes * 60:
                 available_slots.append({
                     'start_time': current_time.strftime('%H:%M'),
                     'end_time': (current_time + timedelta(minutes=duration_minutes)).strftime('%H:%M'),
                     'datetime': current_time.isoformat()
                 })
             
-            return available_slots
-            
-        except Exception as e:
-            print(f"Error checking availability: {e}")
-            return []
+            current_time = max(current_time, event_end)
+        
+        # Check for slot after last event
+        if (end_time - current_time).total_seconds() >= duration_minutes * 60:
+            available_slots.append({
+                'start_time': current_time.strftime('%H:%M'),
+                'end_time': (current_time + timedelta(minutes=duration_minutes)).strftime('%H:%M'),
+                'datetime': current_time.isoformat()
+            })
+        
+        return available_slots
     
     def book_appointment(self, 
                         customer_name: str,
@@ -379,74 +404,25 @@ class GoogleCalendarIntegration:
             Booking result with event details
         """
         try:
-            # Get appointment configuration
-            config = self.appointment_types.get(appointment_type, self.appointment_types['consultation'])
-            duration = config['duration']
-            
-            # Parse start time
-            start_time = datetime.fromisoformat(start_datetime)
-            end_time = start_time + timedelta(minutes=duration)
-            
-            # Create event
-            event = {
-                'summary': f'{appointment_type.title()} - {customer_name}',
-                'description': description,
-                'start': {
-                    'dateTime': start_time.isoformat(),
-                    'timeZone': self.business_hours['timezone'],
-                },
-                'end': {
-                    'dateTime': end_time.isoformat(),
-                    'timeZone': self.business_hours['timezone'],
-                },
-                'attendees': [
-                    {'email': customer_email, 'displayName': customer_name}
-                ],
-                'reminders': {
-                    'useDefault': False,
-                    'overrides': [
-                        {'method': 'email', 'minutes': 24 * 60},  # 24 hours
-                        {'method': 'email', 'minutes': 60},       # 1 hour
-                    ],
-                },
-                'guestsCanModify': False,
-                'guestsCanInviteOthers': False,
-                'sendUpdates': 'all'  # Send invites to all attendees
-            }
+            event, start_time, end_time, duration = self._build_event(
+                customer_name, customer_email, start_datetime, appointment_type, description
+            )
             
             # Create the event
             created_event = self.service.events().insert(
                 calendarId=self.calendar_id,
                 body=event,
                 sendUpdates='all'
-            ).execute()
-            
-            # Prepare appointment details for confirmation email
-            appointment_details = {
-                'type': appointment_type,
-                'start_time': start_time.strftime('%A, %B %d, %Y at %I:%M %p'),
-                'duration': str(duration),
-                'event_id': created_event['id']
-            }
+            ).execute(http=self._http())
             
             # Send immediate confirmation email
             email_sent = self._send_confirmation_email(
                 customer_name=customer_name,
                 customer_email=customer_email,
-                appointment_details=appointment_details
+                appointment_details=self._appointment_details(created_event, appointment_type, start_time, duration)
             )
             
-            result = {
-                'success': True,
-                'event_id': created_event['id'],
-                'event_link': created_event.get('htmlLink'),
-                'start_time': start_time.strftime('%Y-%m-%d %H:%M'),
-                'end_time': end_time.strftime('%Y-%m-%d %H:%M'),
-                'message': f'Appointment booked successfully for {customer_name}',
-                'confirmation_email_sent': email_sent
-            }
-            
-            return result
+            return self._booking_result(created_event, customer_name, start_time, end_time, email_sent)
             
         except HttpError as e:
             return {
@@ -461,6 +437,67 @@ class GoogleCalendarIntegration:
                 'message': 'Failed to book appointment'
             }
     
+    def _build_event(self, customer_name: str, customer_email: str, start_datetime: str,
+                     appointment_type: str, description: str):
+        """Build the Calendar event body for a booking"""
+        # Get appointment configuration
+        config = self.appointment_types.get(appointment_type, self.appointment_types['consultation'])
+        duration = config['duration']
+        
+        # Parse start time
+        start_time = datetime.fromisoformat(start_datetime)
+        end_time = start_time + timedelta(minutes=duration)
+        
+        event = {
+            'summary': f'{appointment_type.title()} - {customer_name}',
+            'description': description,
+            'start': {
+                'dateTime': start_time.isoformat(),
+                'timeZone': self.business_hours['timezone'],
+            },
+            'end': {
+                'dateTime': end_time.isoformat(),
+                'timeZone': self.business_hours['timezone'],
+            },
+            'attendees': [
+                {'email': customer_email, 'displayName': customer_name}
+            ],
+            'reminders': {
+                'useDefault': False,
+                'overrides': [
+                    {'method': 'email', 'minutes': 24 * 60},  # 24 hours
+                    {'method': 'email', 'minutes': 60},       # 1 hour
+                ],
+            },
+            'guestsCanModify': False,
+            'guestsCanInviteOthers': False,
+            'sendUpdates': 'all'  # Send invites to all attendees
+        }
+        return event, start_time, end_time, duration
+    
+    def _appointment_details(self, created_event: Dict[str, Any], appointment_type: str,
+                             start_time: datetime, duration: int) -> Dict[str, Any]:
+        """Prepare appointment details for the confirmation email"""
+        return {
+            'type': appointment_type,
+            'start_time': start_time.strftime('%A, %B %d, %Y at %I:%M %p'),
+            'duration': str(duration),
+            'event_id': created_event['id']
+        }
+    
+    def _booking_result(self, created_event: Dict[str, Any], customer_name: str,
+                        start_time: datetime, end_time: datetime, email_sent: bool) -> Dict[str, Any]:
+        """Build the booking result returned to callers"""
+        return {
+            'success': True,
+            'event_id': created_event['id'],
+            'event_link': created_event.get('htmlLink'),
+            'start_time': start_time.strftime('%Y-%m-%d %H:%M'),
+            'end_time': end_time.strftime('%Y-%m-%d %H:%M'),
+            'message': f'Appointment booked successfully for {customer_name}',
+            'confirmation_email_sent': email_sent
+        }
+    
     def modify_appointment(self, event_id: str, **updates) -> Dict[str, Any]:
         """
         Modify an existing appointment
@@ -477,22 +514,9 @@ class GoogleCalendarIntegration:
             event = self.service.events().get(
                 calendarId=self.calendar_id,
                 eventId=event_id
-            ).execute()
-            
-            # Update fields
-            if 'start_datetime' in updates:
-                start_time = datetime.fromisoformat(updates['start_datetime'])
-                duration_minutes = self.appointment_types.get(
-                    updates.get('appointment_type', 'consultation'), 
-                    self.appointment_types['consultation']
-                )['duration']
-                end_time = start_time + timedelta(minutes=duration_minutes)
-                
-                event['start']['dateTime'] = start_time.isoformat()
-                event['end']['dateTime'] = end_time.isoformat()
+            ).execute(http=self._http())
             
-            if 'description' in updates:
-                event['description'] = updates['description']
+            self._apply_updates(event, updates)
             
             # Update the event
             updated_event = self.service.events().update(
@@ -500,7 +524,7 @@ class GoogleCalendarIntegration:
                 eventId=event_id,
                 body=event,
                 sendUpdates='all'
-            ).execute()
+            ).execute(http=self._http())
             
             return {
                 'success': True,
@@ -515,6 +539,22 @@ class GoogleCalendarIntegration:
                 'message': 'Failed to update appointment'
             }
     
+    def _apply_updates(self, event: Dict[str, Any], updates: Dict[str, Any]):
+        """Apply modify_appointment updates to a fetched event body in place"""
+        if 'start_datetime' in updates:
+            start_time = datetime.fromisoformat(updates['start_datetime'])
+            duration_minutes = self.appointment_types.get(
+                updates.get('appointment_type', 'consultation'), 
+                self.appointment_types['consultation']
+            )['duration']
+            end_time = start_time + timedelta(minutes=duration_minutes)
+            
+            event['start']['dateTime'] = start_time.isoformat()
+            event['end']['dateTime'] = end_time.isoformat()
+        
+        if 'description' in updates:
+            event['description'] = updates['description']
+    
     def cancel_appointment(self, event_id: str) -> Dict[str, Any]:
         """
         Cancel an appointment
@@ -530,7 +570,7 @@ class GoogleCalendarIntegration:
                 calendarId=self.calendar_id,
                 eventId=event_id,
                 sendUpdates='all'
-            ).execute()
+            ).execute(http=self._http())
             
             return {
                 'success': True,
@@ -555,8 +595,7 @@ class GoogleCalendarIntegration:
             List of upcoming appointments
         """
         try:
-            now = datetime.now(pytz.timezone(self.business_hours['timezone']))
-            future = now + timedelta(days=days_ahead)
+            now, future = self._upcoming_window(days_ahead)
             
             events_result = self.service.events().list(
                 calendarId=self.calendar_id,
@@ -564,23 +603,410 @@ class GoogleCalendarIntegration:
                 timeMax=future.isoformat(),
                 singleEvents=True,
                 orderBy='startTime'
-            ).execute()
+            ).execute(http=self._http())
             
             events = events_result.get('items', [])
-            appointments = []
-            
-            for event in events:
-                start = event['start'].get('dateTime', event['start'].get('date'))
-                appointments.append({
-                    'id': event['id'],
-                    'summary': event.get('summary', ''),
-                    'start_time': start,
-                    'description': event.get('description', ''),
-                    'attendees': [att.get('email') for att in event.get('attendees', [])]
+            return [self._to_appointment(event) for event in events]
+            
+        except Exception as e:
+            print(f"Error getting appointments: {e}")
+            return []
+    
+    def _upcoming_window(self, days_ahead: int):
+        """Get the (now, now + days_ahead) window in the business timezone"""
+        now = datetime.now(pytz.timezone(self.business_hours['timezone']))
+        return now, now + timedelta(days=days_ahead)
+    
+    def _to_appointment(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert a Calendar event resource to an appointment summary"""
+        start = event['start'].get('dateTime', event['start'].get('date'))
+        return {
+            'id': event['id'],
+            'summary': event.get('summary', ''),
+            'start_time': start,
+            'description': event.get('description', ''),
+            'attendees': [att.get('email') for att in event.get('attendees', [])]
+        }
+
+class CalendarAPIError(Exception):
+    """Error response from the Google Calendar REST API"""
+    
+    def __init__(self, status: int, message: str):
+        super().__init__(f"{status} {message}")
+        self.status = status
+
+
+class AsyncGoogleCalendarIntegration:
+    """
+    Non-blocking Google Calendar integration for use inside the agent event loop
+    
+    Shares OAuth credentials, business configuration and slot logic with
+    GoogleCalendarIntegration, but calls the Calendar REST API over a single
+    reused aiohttp session instead of the blocking discovery client.
+    """
+    
+    API_BASE = 'https://www.googleapis.com/calendar/v3'
+    BATCH_URL = 'https://www.googleapis.com/batch/calendar/v3'
+    MAX_BATCH_SIZE = 50
+    # Seconds a day's fetched events are reused for availability checks
+    EVENTS_CACHE_TTL = 30
+    
+    def __init__(self, credentials_file: str = 'config/credentials.json', token_file: str = 'config/token.json',
+                 batch_window: float = 0.0):
+        """
+        Initialize async Google Calendar integration
+        
+        Args:
+            credentials_file: Path to Google OAuth2 credentials file
+            token_file: Path to store OAuth2 token
+            batch_window: Seconds to collect concurrent requests into one batch call (0 disables)
+        """
+        self.integration = GoogleCalendarIntegration(credentials_file, token_file)
+        self.calendar_id = self.integration.calendar_id
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.batch_window = batch_window
+        self._pending: List[tuple] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        # Date -> (expires_at, events), cleared on every successful write; the only read
+        # cache, shared by every session using this integration
+        self._day_events: Dict[str, tuple] = {}
+        # Bumped on every write, so a fetch that overlapped a write is not cached
+        self._events_generation = 0
+        # Dedicated pool for the remaining blocking work (token refresh, SMTP),
+        # so it cannot exhaust the loop's shared default executor
+        self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="calendar-io")
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Create the shared HTTP session on first use"""
+        if self.session is None or self.session.closed:
+            # One pooled keep-alive connection set for all calls, so the TLS
+            # handshake to googleapis.com is paid once rather than per request
+            self.session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=10),
+                connector=aiohttp.TCPConnector(limit=10, keepalive_timeout=60, ttl_dns_cache=300)
+            )
+        return self.session
+    
+    async def close(self):
+        """Close HTTP session and worker threads."""
+        if self.session:
+            await self.session.close()
+        self._executor.shutdown(wait=False)
+    
+    async def _run_blocking(self, func, *args):
+        """Run a blocking call on the calendar worker pool"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+    
+    async def _access_token(self, force_refresh: bool = False) -> str:
+        """Get a valid OAuth access token, refreshing it off the event loop if expired"""
+        creds = self.integration.credentials
+        if force_refresh or not creds.valid:
+            await self._run_blocking(creds.refresh, Request())
+        return creds.token
+    
+    def _events_url(self, path: str = '') -> str:
+        """Get the URL of the events collection, or of one event when path is given"""
+        return f"{self.API_BASE}/calendars/{quote(self.calendar_id, safe='')}/events{path}"
+    
+    async def _request(self, method: str, path: str = '', params: Optional[Dict[str, str]] = None,
+                       body: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Send a request to the events collection, coalescing into batches when enabled"""
+        if not self.batch_window:
+            return await self._send(method, path, params, body)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((method, path, params, body, future))
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_after_window())
+        return await future
+    
+    async def _send(self, method: str, path: str = '', params: Optional[Dict[str, str]] = None,
+                    body: Optional[Dict[str, Any]] = None, retry_auth: bool = True) -> Dict[str, Any]:
+        """Send a single request to the events collection of the configured calendar"""
+        session = await self._get_session()
+        headers = {'Authorization': f'Bearer {await self._access_token(force_refresh=not retry_auth)}'}
+        
+        async with session.request(method, self._events_url(path), params=params, json=body, headers=headers) as response:
+            if response.status == 401 and retry_auth:
+                # Token revoked or expired server-side: refresh once and retry
+                return await self._send(method, path, params, body, retry_auth=False)
+            if response.status == 204:
+                return {}
+            payload = await response.json(content_type=None)
+            if response.status >= 400:
+                error = payload.get('error', {}) if isinstance(payload, dict) else {}
+                raise CalendarAPIError(response.status, error.get('message', response.reason))
+            return payload
+    
+    async def _flush_after_window(self):
+        """Wait for the batch window, then send everything queued during it"""
+        await asyncio.sleep(self.batch_window)
+        pending, self._pending = self._pending, []
+        self._flush_task = None
+        
+        for start in range(0, len(pending), self.MAX_BATCH_SIZE):
+            calls = pending[start:start + self.MAX_BATCH_SIZE]
+            try:
+                if len(calls) == 1:
+                    method, path, params, body, _ = calls[0]
+                    results = [await self._send(method, path, params, body)]
+                else:
+                    results = await self._send_batch(calls)
+            except Exception as e:
+                results = [e] * len(calls)
+            
+            for (*_, future), result in zip(calls, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+    
+    async def _send_batch(self, calls: List[tuple]) -> List[Any]:
+        """Send queued calls as one multipart/mixed batch request
+        
+        Returns one payload or CalendarAPIError per call, in call order.
+        """
+        boundary = f"batch_{uuid.uuid4().hex}"
+        parts = []
+        for index, (method, path, params, body, _) in enumerate(calls):
+            target = urlsplit(self._events_url(path)).path
+            if params:
+                target += '?' + urlencode(params)
+            lines = [
+                f'--{boundary}',
+                'Content-Type: application/http',
+                f'Content-ID: <item{index}>',
+                '',
+                f'{method} {target} HTTP/1.1',
+            ]
+            if body is not None:
+                lines += ['Content-Type: application/json', '', json.dumps(body)]
+            else:
+                lines.append('')
+            parts.append('\r\n'.join(lines))
+        payload = '\r\n'.join(parts) + f'\r\n--{boundary}--\r\n'
+        
+        session = await self._get_session()
+        headers = {
+            'Authorization': f'Bearer {await self._access_token()}',
+            'Content-Type': f'multipart/mixed; boundary={boundary}'
+        }
+        async with session.post(self.BATCH_URL, data=payload.encode('utf-8'), headers=headers) as response:
+            text = await response.text()
+            if response.status >= 400:
+                raise CalendarAPIError(response.status, response.reason)
+            response_boundary = response.headers.get('Content-Type', '').split('boundary=')[-1].strip('"')
+        
+        responses = self._parse_batch_response(text, response_boundary)
+        results = []
+        for index in range(len(calls)):
+            status, data = responses.get(index, (502, {}))
+            if status >= 400:
+                error = data.get('error', {}) if isinstance(data, dict) else {}
+                results.append(CalendarAPIError(status, error.get('message', 'Batch item failed')))
+            else:
+                results.append(data)
+        return results
+    
+    @staticmethod
+    def _parse_batch_response(text: str, boundary: str) -> Dict[int, tuple]:
+        """Parse a multipart/mixed batch response into {item index: (status, payload)}"""
+        responses = {}
+        for part in text.replace('\r\n', '\n').split(f'--{boundary}'):
+            part = part.strip()
+            if not part or part == '--':
+                continue
+            
+            part_headers, _, http_response = part.partition('\n\n')
+            content_id = ''
+            for line in part_headers.split('\n'):
+                name, _, value = line.partition(':')
+                if name.strip().lower() == 'content-id':
+                    content_id = value.strip().strip('<>')
+            if not content_id.startswith('response-item'):
+                continue
+            
+            head, _, body = http_response.partition('\n\n')
+            status = int(head.split('\n', 1)[0].split()[1])
+            responses[int(content_id[len('response-item'):])] = (status, json.loads(body) if body.strip() else {})
+        return responses
+    
+    def _invalidate_events(self):
+        """Forget cached day events after the calendar changes"""
+        self._day_events.clear()
+        self._events_generation += 1
+    
+    async def check_availability(self, date: str, duration_minutes: int = 60) -> List[Dict[str, Any]]:
+        """
+        Check available time slots for a given date
+        
+        Args:
+            date: Date in YYYY-MM-DD format
+            duration_minutes: Appointment duration in minutes
+            
+        Returns:
+            List of available time slots
+        """
+        try:
+            start_time, end_time = self.integration._business_window(date)
+            
+            # A burst of checks for one day (e.g. different durations) shares one fetch;
+            # the start-ordered events are then swept once per check
+            cached = self._day_events.get(date)
+            if cached and cached[0] > time.monotonic():
+                events = cached[1]
+            else:
+                generation = self._events_generation
+                events_result = await self._request('GET', params={
+                    'timeMin': start_time.isoformat(),
+                    'timeMax': end_time.isoformat(),
+                    'singleEvents': 'true',
+                    'orderBy': 'startTime'
                 })
+                events = events_result.get('items', [])
+                if generation == self._events_generation:
+                    self._day_events[date] = (time.monotonic() + self.EVENTS_CACHE_TTL, events)
             
-            return appointments
+            return self.integration._find_free_slots(events, start_time, end_time, duration_minutes)
+            
+        except Exception as e:
+            print(f"Error checking availability: {e}")
+            return []
+    
+    async def book_appointment(self, 
+                               customer_name: str,
+                               customer_email: str,
+                               start_datetime: str,
+                               appointment_type: str = 'consultation',
+                               description: str = '') -> Dict[str, Any]:
+        """
+        Book an appointment in Google Calendar
+        
+        Args:
+            customer_name: Customer's name
+            customer_email: Customer's email
+            start_datetime: Start time in ISO format
+            appointment_type: Type of appointment
+            description: Additional description
+            
+        Returns:
+            Booking result with event details
+        """
+        try:
+            event, start_time, end_time, duration = self.integration._build_event(
+                customer_name, customer_email, start_datetime, appointment_type, description
+            )
+            
+            created_event = await self._request('POST', params={'sendUpdates': 'all'}, body=event)
+            self._invalidate_events()
+            
+            # SMTP is blocking, so the confirmation email is sent from a worker thread
+            email_sent = await self._run_blocking(
+                self.integration._send_confirmation_email,
+                customer_name,
+                customer_email,
+                self.integration._appointment_details(created_event, appointment_type, start_time, duration)
+            )
+            
+            return self.integration._booking_result(created_event, customer_name, start_time, end_time, email_sent)
+            
+        except CalendarAPIError as e:
+            return {
+                'success': False,
+                'error': f'Google Calendar API error: {e}',
+                'message': 'Failed to book appointment'
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'message': 'Failed to book appointment'
+            }
+    
+    async def modify_appointment(self, event_id: str, **updates) -> Dict[str, Any]:
+        """
+        Modify an existing appointment
+        
+        Args:
+            event_id: Google Calendar event ID
+            **updates: Fields to update
+            
+        Returns:
+            Modification result
+        """
+        try:
+            path = f"/{quote(event_id, safe='')}"
+            event = await self._request('GET', path)
+            
+            self.integration._apply_updates(event, updates)
+            
+            updated_event = await self._request('PUT', path, params={'sendUpdates': 'all'}, body=event)
+            self._invalidate_events()
+            
+            return {
+                'success': True,
+                'event_id': updated_event['id'],
+                'message': 'Appointment updated successfully'
+            }
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'message': 'Failed to update appointment'
+            }
+    
+    async def cancel_appointment(self, event_id: str) -> Dict[str, Any]:
+        """
+        Cancel an appointment
+        
+        Args:
+            event_id: Google Calendar event ID
+            
+        Returns:
+            Cancellation result
+        """
+        try:
+            await self._request('DELETE', f"/{quote(event_id, safe='')}", params={'sendUpdates': 'all'})
+            self._invalidate_events()
+            
+            return {
+                'success': True,
+                'message': 'Appointment cancelled successfully'
+            }
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'message': 'Failed to cancel appointment'
+            }
+    
+    async def get_upcoming_appointments(self, days_ahead: int = 7) -> List[Dict[str, Any]]:
+        """
+        Get upcoming appointments
+        
+        Args:
+            days_ahead: Number of days to look ahead
+            
+        Returns:
+            List of upcoming appointments
+        """
+        try:
+            now, future = self.integration._upcoming_window(days_ahead)
+            
+            events_result = await self._request('GET', params={
+                'timeMin': now.isoformat(),
+                'timeMax': future.isoformat(),
+                'singleEvents': 'true',
+                'orderBy': 'startTime'
+            })
+            
+            events = events_result.get('items', [])
+            return [self.integration._to_appointment(event) for event in events]
             
         except Exception as e:
             print(f"Error getting appointments: {e}")
-            return []
\ No newline at end of file
+            return []
@@ -18,7 +18,7 @@ from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+@dataclass(slots=True)
 class KnowledgeDocument:
     """Represents a knowledge base document."""
     id: str
@@ -37,7 +37,7 @@ class KnowledgeDocument:
         if self.updated_at is None:
             self.updated_at = datetime.now()
 
-@dataclass
+@dataclass(slots=True)
 class SearchResult:
     """Represents a search result from the knowledge base."""
     document: KnowledgeDocument
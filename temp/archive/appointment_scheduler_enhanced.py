@@ -4,17 +4,44 @@ Integrates with Google Calendar and provides real-time scheduling capabilities
 """
 
 import asyncio
+import bisect
+import itertools
 import logging
+import re
 from datetime import datetime, timedelta, timezone
-from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
 from enum import Enum
-import json
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Optional fast JSON encoder; stdlib json is only imported as the fallback
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    import json
+    ORJSON_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# Intent keywords, matched against the tokenized message in this order
+BOOKING_KEYWORDS = frozenset({"book", "booking", "schedule", "appointment", "make"})
+RESCHEDULE_KEYWORDS = frozenset({"reschedule", "change", "move"})
+CANCELLATION_KEYWORDS = frozenset({"cancel", "delete"})
+AVAILABILITY_KEYWORDS = frozenset({"availability", "available", "when", "times"})
+INQUIRY_KEYWORDS = frozenset({"appointments", "upcoming", "scheduled"})
+
+_WORD_RE = re.compile(r"[a-z]+")
+
+def dumps_json(payload) -> bytes:
+    """Serialize a to_dict() payload to JSON bytes, using orjson when installed."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _epoch(moment: datetime) -> int:
+    """Convert a datetime to integer epoch seconds for internal comparisons."""
+    return int(moment.timestamp())
+
 class AppointmentStatus(Enum):
     """Appointment status enumeration."""
     SCHEDULED = "scheduled"
@@ -31,7 +58,7 @@ class AppointmentType(Enum):
     THERAPY = "therapy"
     EMERGENCY = "emergency"
 
-@dataclass
+@dataclass(slots=True)
 class TimeSlot:
     """Represents an available time slot."""
     start_time: datetime
@@ -39,10 +66,14 @@ class TimeSlot:
     available: bool = True
     appointment_type: Optional[AppointmentType] = None
     provider_id: Optional[str] = None
+    _duration_minutes: int = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        self._duration_minutes = int((self.end_time - self.start_time).total_seconds() / 60)
     
     def duration_minutes(self) -> int:
         """Get duration in minutes."""
-        return int((self.end_time - self.start_time).total_seconds() / 60)
+        return self._duration_minutes
     
     def to_dict(self) -> Dict:
         """Convert to dictionary for JSON serialization."""
@@ -54,8 +85,12 @@ class TimeSlot:
             "provider_id": self.provider_id,
             "duration_minutes": self.duration_minutes()
         }
+    
+    def to_json(self) -> bytes:
+        """Serialize to JSON bytes."""
+        return dumps_json(self.to_dict())
 
-@dataclass
+@dataclass(slots=True)
 class Appointment:
     """Represents a scheduled appointment."""
     appointment_id: str
@@ -68,10 +103,25 @@ class Appointment:
     provider_id: Optional[str] = None
     notes: Optional[str] = None
     created_at: Optional[datetime] = None
+    start_ts: int = field(init=False, repr=False, compare=False)
+    end_ts: int = field(init=False, repr=False, compare=False)
     
     def __post_init__(self):
         if self.created_at is None:
             self.created_at = datetime.now(timezone.utc)
+        self.start_ts = _epoch(self.start_time)
+        self.end_ts = _epoch(self.end_time)
+    
+    def set_times(self, start_time: datetime, end_time: datetime):
+        """Move the appointment, keeping the epoch fields in sync."""
+        self.start_time = start_time
+        self.end_time = end_time
+        self.start_ts = _epoch(start_time)
+        self.end_ts = _epoch(end_time)
+    
+    def duration_minutes(self) -> int:
+        """Get duration in minutes."""
+        return (self.end_ts - self.start_ts) // 60
     
     def to_dict(self) -> Dict:
         """Convert to dictionary for JSON serialization."""
@@ -87,6 +137,10 @@ class Appointment:
             "notes": self.notes,
             "created_at": self.created_at.isoformat() if self.created_at else None
         }
+    
+    def to_json(self) -> bytes:
+        """Serialize to JSON bytes."""
+        return dumps_json(self.to_dict())
 
 class BusinessHours:
     """Manages business hours and availability."""
@@ -143,6 +197,16 @@ class SchedulingEngine:
     def __init__(self):
         self.business_hours = BusinessHours()
         self.appointments: Dict[str, Appointment] = {}
+        self._id_seq = itertools.count(1)
+        # Active (non-cancelled) appointments ordered by start, for bisect conflict checks
+        self._by_start: List[Appointment] = []
+        self._max_duration_s = 0
+        # Merged busy intervals derived from _by_start, rebuilt lazily when dirty
+        self._busy_starts: List[int] = []
+        self._busy_ends: List[int] = []
+        self._busy_dirty = False
+        # Serialises check-then-insert so concurrent turns cannot double-book a slot
+        self._write_lock = asyncio.Lock()
         self.calendar_connector = None  # Will be initialized with actual calendar API
         logger.info("✅ Scheduling engine initialized")
     
@@ -153,7 +217,7 @@ class SchedulingEngine:
         """Get available time slots for a specific date and appointment type."""
         
         if not self.business_hours.is_business_day(date):
-            logger.info(f"📅 {date.strftime('%A, %B %d')} is not a business day")
+            logger.info("📅 %s is not a business day", date)
             return []
         
         business_hours = self.business_hours.get_business_hours(date)
@@ -166,41 +230,126 @@ class SchedulingEngine:
         if duration_minutes is None:
             duration_minutes = self.business_hours.get_appointment_duration(appointment_type)
         
-        # Generate time slots
-        available_slots = []
-        current_time = start_time
+        available_slots = self._generate_slots(start_time, end_time, duration_minutes, appointment_type)
+        
+        logger.info("📅 Found %d available slots for %s", len(available_slots), date)
+        return available_slots
+    
+    async def get_availability_range(self,
+                                   start_date: datetime,
+                                   days: int,
+                                   appointment_type: AppointmentType,
+                                   duration_minutes: Optional[int] = None) -> List[Tuple[datetime, List[TimeSlot]]]:
+        """Get available time slots for consecutive days in a single pass over bookings."""
+        
+        if duration_minutes is None:
+            duration_minutes = self.business_hours.get_appointment_duration(appointment_type)
+        
+        availability = []
+        for offset in range(days):
+            date = start_date + timedelta(days=offset)
+            business_hours = self.business_hours.get_business_hours(date)
+            if not business_hours:
+                availability.append((date, []))
+                continue
+            
+            start_time, end_time = business_hours
+            availability.append((date, self._generate_slots(
+                start_time, end_time, duration_minutes, appointment_type
+            )))
         
-        while current_time + timedelta(minutes=duration_minutes) <= end_time:
-            slot_end = current_time + timedelta(minutes=duration_minutes)
+        logger.info("📅 Checked availability for %d days from %s", days, start_date)
+        return availability
+    
+    def _generate_slots(self,
+                        start_time: datetime,
+                        end_time: datetime,
+                        duration_minutes: int,
+                        appointment_type: AppointmentType) -> List[TimeSlot]:
+        """Generate free slots between business-hour bounds."""
+        # Work on epoch seconds; datetimes are only built for free slots
+        available_slots = []
+        day_start_ts = _epoch(start_time)
+        day_end_ts = _epoch(end_time)
+        duration_s = duration_minutes * 60
+        step_s = duration_s + self.business_hours.buffer_time * 60
+        
+        # Two-pointer sweep: slots and merged busy intervals both ascend
+        busy_starts, busy_ends = self._busy_intervals()
+        busy_count = len(busy_ends)
+        j = bisect.bisect_right(busy_ends, day_start_ts)
+        
+        for slot_start_ts in range(day_start_ts, day_end_ts - duration_s + 1, step_s):
+            slot_end_ts = slot_start_ts + duration_s
+            while j < busy_count and busy_ends[j] <= slot_start_ts:
+                j += 1
             
             # Check if slot conflicts with existing appointments
-            if not self._has_conflict(current_time, slot_end):
+            if not (j < busy_count and busy_starts[j] < slot_end_ts):
+                slot_start = start_time + timedelta(seconds=slot_start_ts - day_start_ts)
                 slot = TimeSlot(
-                    start_time=current_time,
-                    end_time=slot_end,
+                    start_time=slot_start,
+                    end_time=slot_start + timedelta(seconds=duration_s),
                     available=True,
                     appointment_type=appointment_type
                 )
                 available_slots.append(slot)
-            
-            # Move to next slot (including buffer time)
-            current_time += timedelta(minutes=duration_minutes + self.business_hours.buffer_time)
         
-        logger.info(f"📅 Found {len(available_slots)} available slots for {date.strftime('%A, %B %d')}")
         return available_slots
     
-    def _has_conflict(self, start_time: datetime, end_time: datetime) -> bool:
-        """Check if the time slot conflicts with existing appointments."""
-        for appointment in self.appointments.values():
-            if appointment.status in [AppointmentStatus.CANCELLED]:
+    def _has_conflict(self, start_ts: int, end_ts: int, exclude_id: Optional[str] = None) -> bool:
+        """Check if the epoch-second range conflicts with existing appointments."""
+        if exclude_id is None:
+            # Merged intervals are disjoint, so only the last one starting
+            # before end_ts can overlap
+            busy_starts, busy_ends = self._busy_intervals()
+            idx = bisect.bisect_left(busy_starts, end_ts) - 1
+            return idx >= 0 and busy_ends[idx] > start_ts
+        
+        # Everything left of idx starts before end_ts; walk back until no
+        # appointment starting that early could still reach start_ts
+        idx = bisect.bisect_left(self._by_start, end_ts, key=lambda apt: apt.start_ts)
+        earliest_start = start_ts - self._max_duration_s
+        for i in range(idx - 1, -1, -1):
+            appointment = self._by_start[i]
+            if appointment.start_ts < earliest_start:
+                break
+            if appointment.appointment_id == exclude_id:
                 continue
             
             # Check for overlap
-            if (start_time < appointment.end_time and end_time > appointment.start_time):
+            if appointment.end_ts > start_ts:
                 return True
         
         return False
     
+    def _index_appointment(self, appointment: Appointment):
+        """Insert an active appointment into the start-ordered index."""
+        bisect.insort(self._by_start, appointment, key=lambda apt: apt.start_ts)
+        self._max_duration_s = max(self._max_duration_s, appointment.end_ts - appointment.start_ts)
+        self._busy_dirty = True
+    
+    def _unindex_appointment(self, appointment: Appointment):
+        """Remove an appointment from the start-ordered index."""
+        self._by_start.remove(appointment)
+        self._busy_dirty = True
+    
+    def _busy_intervals(self) -> Tuple[List[int], List[int]]:
+        """Get merged busy intervals as parallel sorted start/end lists."""
+        if self._busy_dirty:
+            busy_starts: List[int] = []
+            busy_ends: List[int] = []
+            for appointment in self._by_start:
+                if busy_ends and appointment.start_ts <= busy_ends[-1]:
+                    busy_ends[-1] = max(busy_ends[-1], appointment.end_ts)
+                else:
+                    busy_starts.append(appointment.start_ts)
+                    busy_ends.append(appointment.end_ts)
+            self._busy_starts = busy_starts
+            self._busy_ends = busy_ends
+            self._busy_dirty = False
+        return self._busy_starts, self._busy_ends
+    
     async def book_appointment(self, 
                              customer_phone: str,
                              customer_name: str,
@@ -209,89 +358,81 @@ class SchedulingEngine:
                              notes: Optional[str] = None) -> Tuple[bool, str, Optional[Appointment]]:
         """Book an appointment."""
         
-        # Generate appointment ID
-        appointment_id = f"apt_{int(datetime.now().timestamp())}_{customer_phone[-4:]}"
+        async with self._write_lock:
+            # Generate appointment ID
+            appointment_id = f"apt_{next(self._id_seq)}_{customer_phone[-4:]}"
         
-        # Calculate end time
-        duration = self.business_hours.get_appointment_duration(appointment_type)
-        end_time = start_time + timedelta(minutes=duration)
+            # Calculate end time
+            duration = self.business_hours.get_appointment_duration(appointment_type)
+            end_time = start_time + timedelta(minutes=duration)
         
-        # Check availability
-        if self._has_conflict(start_time, end_time):
-            return False, "Time slot is no longer available", None
+            # Check availability
+            if self._has_conflict(_epoch(start_time), _epoch(end_time)):
+                return False, "Time slot is no longer available", None
         
-        # Check business hours
-        if not self.business_hours.is_business_day(start_time):
-            return False, "Selected date is not a business day", None
+            # Check business hours
+            if not self.business_hours.is_business_day(start_time):
+                return False, "Selected date is not a business day", None
         
-        business_hours = self.business_hours.get_business_hours(start_time)
-        if not business_hours:
-            return False, "Selected date is outside business hours", None
-        
-        bh_start, bh_end = business_hours
-        if start_time < bh_start or end_time > bh_end:
-            return False, f"Appointment must be between {bh_start.strftime('%I:%M %p')} and {bh_end.strftime('%I:%M %p')}", None
-        
-        # Create appointment
-        appointment = Appointment(
-            appointment_id=appointment_id,
-            customer_phone=customer_phone,
-            customer_name=customer_name,
-            appointment_type=appointment_type,
-            start_time=start_time,
-            end_time=end_time,
-            notes=notes
-        )
+            business_hours = self.business_hours.get_business_hours(start_time)
+            if not business_hours:
+                return False, "Selected date is outside business hours", None
         
-        # Store appointment
-        self.appointments[appointment_id] = appointment
+            bh_start, bh_end = business_hours
+            if start_time < bh_start or end_time > bh_end:
+                return False, f"Appointment must be between {bh_start.strftime('%I:%M %p')} and {bh_end.strftime('%I:%M %p')}", None
         
-        logger.info(f"✅ Appointment booked: {appointment_id} for {customer_name} on {start_time.strftime('%A, %B %d at %I:%M %p')}")
+            # Create appointment
+            appointment = Appointment(
+                appointment_id=appointment_id,
+                customer_phone=customer_phone,
+                customer_name=customer_name,
+                appointment_type=appointment_type,
+                start_time=start_time,
+                end_time=end_time,
+                notes=notes
+            )
         
-        return True, f"Appointment confirmed for {start_time.strftime('%A, %B %d at %I:%M %p')}", appointment
+            # Store appointment
+            self.appointments[appointment_id] = appointment
+            self._index_appointment(appointment)
+        
+            logger.info("✅ Appointment booked: %s for %s on %s", appointment_id, customer_name, start_time)
+        
+            return True, f"Appointment confirmed for {start_time.strftime('%A, %B %d at %I:%M %p')}", appointment
     
     async def reschedule_appointment(self, 
                                    appointment_id: str,
                                    new_start_time: datetime) -> Tuple[bool, str, Optional[Appointment]]:
         """Reschedule an existing appointment."""
         
-        if appointment_id not in self.appointments:
-            return False, "Appointment not found", None
+        async with self._write_lock:
+            if appointment_id not in self.appointments:
+                return False, "Appointment not found", None
         
-        appointment = self.appointments[appointment_id]
+            appointment = self.appointments[appointment_id]
         
-        if appointment.status == AppointmentStatus.CANCELLED:
-            return False, "Cannot reschedule a cancelled appointment", None
+            if appointment.status == AppointmentStatus.CANCELLED:
+                return False, "Cannot reschedule a cancelled appointment", None
         
-        # Calculate new end time
-        duration = self.business_hours.get_appointment_duration(appointment.appointment_type)
-        new_end_time = new_start_time + timedelta(minutes=duration)
+            # Calculate new end time
+            duration = self.business_hours.get_appointment_duration(appointment.appointment_type)
+            new_end_time = new_start_time + timedelta(minutes=duration)
         
-        # Temporarily remove current appointment to check conflicts
-        old_start = appointment.start_time
-        old_end = appointment.end_time
-        appointment.start_time = new_start_time
-        appointment.end_time = new_end_time
+            new_start_ts = _epoch(new_start_time)
+            new_end_ts = _epoch(new_end_time)
         
-        # Check for conflicts (excluding this appointment)
-        temp_appointments = {k: v for k, v in self.appointments.items() if k != appointment_id}
-        has_conflict = False
-        for other_apt in temp_appointments.values():
-            if other_apt.status in [AppointmentStatus.CANCELLED]:
-                continue
-            if (new_start_time < other_apt.end_time and new_end_time > other_apt.start_time):
-                has_conflict = True
-                break
+            # Check for conflicts (excluding this appointment)
+            if self._has_conflict(new_start_ts, new_end_ts, exclude_id=appointment_id):
+                return False, "New time slot is not available", None
         
-        if has_conflict:
-            # Restore original times
-            appointment.start_time = old_start
-            appointment.end_time = old_end
-            return False, "New time slot is not available", None
+            self._unindex_appointment(appointment)
+            appointment.set_times(new_start_time, new_end_time)
+            self._index_appointment(appointment)
         
-        logger.info(f"✅ Appointment rescheduled: {appointment_id} to {new_start_time.strftime('%A, %B %d at %I:%M %p')}")
+            logger.info("✅ Appointment rescheduled: %s to %s", appointment_id, new_start_time)
         
-        return True, f"Appointment rescheduled to {new_start_time.strftime('%A, %B %d at %I:%M %p')}", appointment
+            return True, f"Appointment rescheduled to {new_start_time.strftime('%A, %B %d at %I:%M %p')}", appointment
     
     async def cancel_appointment(self, appointment_id: str) -> Tuple[bool, str, Optional[Appointment]]:
         """Cancel an appointment."""
@@ -300,9 +441,11 @@ class SchedulingEngine:
             return False, "Appointment not found", None
         
         appointment = self.appointments[appointment_id]
+        if appointment.status != AppointmentStatus.CANCELLED:
+            self._unindex_appointment(appointment)
         appointment.status = AppointmentStatus.CANCELLED
         
-        logger.info(f"❌ Appointment cancelled: {appointment_id}")
+        logger.info("❌ Appointment cancelled: %s", appointment_id)
         
         return True, "Appointment has been cancelled", appointment
     
@@ -334,46 +477,44 @@ Appointment Details:
 class AppointmentSchedulerAgent:
     """Voice agent integration for appointment scheduling."""
     
-    def __init__(self):
+    def __init__(self, clock: Callable[[], datetime] = datetime.now):
         self.scheduling_engine = SchedulingEngine()
+        # Business hours are naive local times, so the default clock is too
+        self._clock = clock
+        self._intents = [
+            (BOOKING_KEYWORDS, self._handle_booking_request),
+            (RESCHEDULE_KEYWORDS, self._handle_reschedule_request),
+            (CANCELLATION_KEYWORDS, self._handle_cancellation_request),
+            (AVAILABILITY_KEYWORDS, self._handle_availability_request),
+            (INQUIRY_KEYWORDS, self._handle_appointment_inquiry),
+        ]
         logger.info("✅ Appointment scheduler agent initialized")
     
     async def handle_scheduling_request(self, message: str, context: Dict) -> str:
         """Handle scheduling requests from voice conversations."""
         
-        message_lower = message.lower()
+        now = self._clock()
+        tokens = frozenset(_WORD_RE.findall(message.lower()))
         customer_phone = context.get("caller_phone", "unknown")
         customer_name = context.get("customer_name", "Customer")
         
         try:
             # Intent detection
-            if any(word in message_lower for word in ["book", "schedule", "appointment", "make"]):
-                return await self._handle_booking_request(message, customer_phone, customer_name)
-            
-            elif any(word in message_lower for word in ["reschedule", "change", "move"]):
-                return await self._handle_reschedule_request(message, customer_phone, customer_name)
-            
-            elif any(word in message_lower for word in ["cancel", "delete"]):
-                return await self._handle_cancellation_request(message, customer_phone, customer_name)
-            
-            elif any(word in message_lower for word in ["availability", "available", "when", "times"]):
-                return await self._handle_availability_request(message, customer_phone, customer_name)
+            for keywords, handler in self._intents:
+                if keywords & tokens:
+                    return await handler(message, customer_phone, customer_name, now)
             
-            elif any(word in message_lower for word in ["my appointments", "upcoming", "scheduled"]):
-                return await self._handle_appointment_inquiry(message, customer_phone, customer_name)
-            
-            else:
-                return self._get_scheduling_help_message()
+            return self._get_scheduling_help_message()
         
         except Exception as e:
-            logger.error(f"Error handling scheduling request: {e}")
+            logger.error("Error handling scheduling request: %s", e)
             return "I'm sorry, I encountered an issue with the scheduling system. Please try again or contact our support team."
     
-    async def _handle_booking_request(self, message: str, customer_phone: str, customer_name: str) -> str:
+    async def _handle_booking_request(self, message: str, customer_phone: str, customer_name: str, now: datetime) -> str:
         """Handle appointment booking requests."""
         
         # For now, provide available times for tomorrow (this would be enhanced with NLP)
-        tomorrow = datetime.now() + timedelta(days=1)
+        tomorrow = now + timedelta(days=1)
         
         # Default to consultation type
         appointment_type = AppointmentType.CONSULTATION
@@ -395,22 +536,23 @@ class AppointmentSchedulerAgent:
 
 Which time works best for you? Just say the number or the time."""
     
-    async def _handle_availability_request(self, message: str, customer_phone: str, customer_name: str) -> str:
+    async def _handle_availability_request(self, message: str, customer_phone: str, customer_name: str, now: datetime) -> str:
         """Handle availability inquiries."""
         
         # Check availability for the next 3 business days
         available_days = []
-        current_date = datetime.now()
-        
-        for i in range(1, 8):  # Check next 7 days
-            check_date = current_date + timedelta(days=i)
-            if self.scheduling_engine.business_hours.is_business_day(check_date):
-                slots = await self.scheduling_engine.get_availability(check_date, AppointmentType.CONSULTATION)
-                if slots:
-                    available_days.append(f"• {check_date.strftime('%A, %B %d')}: {len(slots)} slots available")
-                
-                if len(available_days) >= 3:
-                    break
+        current_date = now
+        
+        # Check next 7 days in one sweep
+        availability = await self.scheduling_engine.get_availability_range(
+            current_date + timedelta(days=1), 7, AppointmentType.CONSULTATION
+        )
+        for check_date, slots in availability:
+            if slots:
+                available_days.append(f"• {check_date.strftime('%A, %B %d')}: {len(slots)} slots available")
+            
+            if len(available_days) >= 3:
+                break
         
         if not available_days:
             return "I don't have any available appointments in the next week. Please contact our office for assistance."
@@ -421,7 +563,7 @@ Which time works best for you? Just say the number or the time."""
 
 Would you like to book an appointment on any of these days?"""
     
-    async def _handle_appointment_inquiry(self, message: str, customer_phone: str, customer_name: str) -> str:
+    async def _handle_appointment_inquiry(self, message: str, customer_phone: str, customer_name: str, now: datetime) -> str:
         """Handle inquiries about existing appointments."""
         
         appointments = await self.scheduling_engine.get_customer_appointments(customer_phone)
@@ -439,7 +581,7 @@ Would you like to book an appointment on any of these days?"""
 
 Would you like to reschedule or cancel any of these?"""
     
-    async def _handle_reschedule_request(self, message: str, customer_phone: str, customer_name: str) -> str:
+    async def _handle_reschedule_request(self, message: str, customer_phone: str, customer_name: str, now: datetime) -> str:
         """Handle rescheduling requests."""
         
         appointments = await self.scheduling_engine.get_customer_appointments(customer_phone)
@@ -464,7 +606,7 @@ What day would you like to reschedule it to?"""
 
 Which appointment would you like to reschedule? Just say the number."""
     
-    async def _handle_cancellation_request(self, message: str, customer_phone: str, customer_name: str) -> str:
+    async def _handle_cancellation_request(self, message: str, customer_phone: str, customer_name: str, now: datetime) -> str:
         """Handle cancellation requests."""
         
         appointments = await self.scheduling_engine.get_customer_appointments(customer_phone)
@@ -538,4 +680,5 @@ async def test_scheduling_engine():
     print("\n✅ Scheduling engine test completed!")
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     asyncio.run(test_scheduling_engine())
\ No newline at end of file
@@ -3,21 +3,196 @@ LiveKit Agent Actions for Calendar Integration
 """
 
 import asyncio
-from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
+import os
+from collections import OrderedDict
+from itertools import islice
+from typing import Dict, List, Any, Optional, Tuple
 try:
     from livekit.agents import llm
+    LIVEKIT_AVAILABLE = True
 except ImportError:
-    # Fallback for testing without LiveKit
-    class MockLLM:
-        class FunctionContext:
-            def __init__(self, name, description, parameters):
-                self.name = name
-                self.description = description
-                self.parameters = parameters
-    llm = MockLLM()
+    # Fallback for testing without LiveKit; opt-in so a missing dependency fails fast in production
+    if not os.getenv("CARESETU_ALLOW_MOCK"):
+        raise
+    from llm_mock import llm
+    LIVEKIT_AVAILABLE = False
 
-from google_calendar_integration import GoogleCalendarIntegration
+# Optional fast JSON encoder; stdlib json is only imported as the fallback
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    import json
+    ORJSON_AVAILABLE = False
+
+from google_calendar_integration import AsyncGoogleCalendarIntegration
+
+# Tool definitions for the LLM; static, so built once at import
+_CALENDAR_ACTIONS_SCHEMA = (
+    {
+        "name": "check_availability",
+        "description": "Check available appointment slots for a specific date",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "date": {
+                    "type": "string",
+                    "description": "Date in YYYY-MM-DD format"
+                },
+                "duration": {
+                    "type": "integer",
+                    "description": "Appointment duration in minutes (default: 60)",
+                    "default": 60
+                }
+            },
+            "required": ["date"]
+        }
+    },
+    
+    {
+        "name": "book_appointment",
+        "description": "Book an appointment for a customer",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "customer_name": {
+                    "type": "string",
+                    "description": "Customer's full name"
+                },
+                "customer_email": {
+                    "type": "string",
+                    "description": "Customer's email address"
+                },
+                "start_datetime": {
+                    "type": "string",
+                    "description": "Appointment start time in ISO format"
+                },
+                "appointment_type": {
+                    "type": "string",
+                    "description": "Type of appointment",
+                    "enum": ["consultation", "follow_up", "assessment"],
+                    "default": "consultation"
+                },
+                "description": {
+                    "type": "string",
+                    "description": "Additional notes or description",
+                    "default": ""
+                }
+            },
+            "required": ["customer_name", "customer_email", "start_datetime"]
+        }
+    },
+    
+    {
+        "name": "modify_appointment",
+        "description": "Modify an existing appointment",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "event_id": {
+                    "type": "string",
+                    "description": "Google Calendar event ID"
+                },
+                "start_datetime": {
+                    "type": "string",
+                    "description": "New appointment start time in ISO format"
+                },
+                "description": {
+                    "type": "string",
+                    "description": "Updated description"
+                }
+            },
+            "required": ["event_id"]
+        }
+    },
+    
+    {
+        "name": "cancel_appointment",
+        "description": "Cancel an appointment",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "event_id": {
+                    "type": "string",
+                    "description": "Google Calendar event ID to cancel"
+                }
+            },
+            "required": ["event_id"]
+        }
+    },
+    
+    {
+        "name": "get_upcoming_appointments",
+        "description": "Get upcoming appointments",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "days_ahead": {
+                    "type": "integer",
+                    "description": "Number of days to look ahead (default: 7)",
+                    "default": 7
+                }
+            }
+        }
+    }
+)
+
+# FunctionContext objects are only needed by a real LiveKit agent
+_CALENDAR_ACTIONS = tuple(llm.FunctionContext(**spec) for spec in _CALENDAR_ACTIONS_SCHEMA) if LIVEKIT_AVAILABLE else ()
+
+# Serialized schema for callers that send the tool definitions to the LLM as JSON
+if ORJSON_AVAILABLE:
+    _CALENDAR_ACTIONS_JSON = orjson.dumps(_CALENDAR_ACTIONS_SCHEMA)
+else:
+    _CALENDAR_ACTIONS_JSON = json.dumps(_CALENDAR_ACTIONS_SCHEMA, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+# Reply templates shared by the action handlers
+_ERR = "Error {op}: {msg}"
+_FAILED = "❌ Failed to {op}: {msg}"
+_BOOK_OK = ("✅ Appointment booked successfully!\n"
+            "Customer: {name}\n"
+            "Time: {start}\n"
+            "Type: {type}\n"
+            "A calendar invite has been sent to {email}")
+_MODIFY_OK = "✅ Appointment updated successfully! Updated calendar invite sent."
+_CANCEL_OK = "✅ Appointment cancelled successfully! Cancellation notice sent to all attendees."
+
+# Shared calendar integrations per credentials file, least recently used first
+MAX_SHARED_CALENDARS = 4
+_calendars: "OrderedDict[str, AsyncGoogleCalendarIntegration]" = OrderedDict()
+# Close tasks for evicted integrations, referenced until they finish
+_closing: set = set()
+
+def _get_calendar(credentials_file: str) -> AsyncGoogleCalendarIntegration:
+    """Shared calendar integration per credentials file, so credentials are loaded once per process"""
+    calendar = _calendars.get(credentials_file)
+    if calendar is not None:
+        _calendars.move_to_end(credentials_file)
+        return calendar
+    
+    # Tool calls issued together by the LLM are coalesced into one batch request
+    calendar = _calendars[credentials_file] = AsyncGoogleCalendarIntegration(credentials_file, batch_window=0.02)
+    while len(_calendars) > MAX_SHARED_CALENDARS:
+        _, evicted = _calendars.popitem(last=False)
+        _close_evicted(evicted)
+    return calendar
+
+def _close_evicted(calendar: AsyncGoogleCalendarIntegration):
+    """Close an evicted integration so its HTTP session and worker threads are released"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        asyncio.run(calendar.close())
+        return
+    task = loop.create_task(calendar.close())
+    _closing.add(task)
+    task.add_done_callback(_closing.discard)
+
+async def close_calendar(credentials_file: str = 'credentials.json'):
+    """Close the shared calendar integration for a credentials file at process shutdown"""
+    calendar = _calendars.pop(credentials_file, None)
+    if calendar is not None:
+        await calendar.close()
 
 class CalendarAgentActions:
     """
@@ -26,117 +201,18 @@ class CalendarAgentActions:
     
     def __init__(self, credentials_file: str = 'credentials.json'):
         """Initialize calendar actions"""
-        self.calendar = GoogleCalendarIntegration(credentials_file)
+        self.calendar = _get_calendar(credentials_file)
         
-        # Define available actions for the LLM
-        self.actions = [
-            llm.FunctionContext(
-                name="check_availability",
-                description="Check available appointment slots for a specific date",
-                parameters={
-                    "type": "object",
-                    "properties": {
-                        "date": {
-                            "type": "string",
-                            "description": "Date in YYYY-MM-DD format"
-                        },
-                        "duration": {
-                            "type": "integer",
-                            "description": "Appointment duration in minutes (default: 60)",
-                            "default": 60
-                        }
-                    },
-                    "required": ["date"]
-                }
-            ),
-            
-            llm.FunctionContext(
-                name="book_appointment",
-                description="Book an appointment for a customer",
-                parameters={
-                    "type": "object",
-                    "properties": {
-                        "customer_name": {
-                            "type": "string",
-                            "description": "Customer's full name"
-                        },
-                        "customer_email": {
-                            "type": "string",
-                            "description": "Customer's email address"
-                        },
-                        "start_datetime": {
-                            "type": "string",
-                            "description": "Appointment start time in ISO format"
-                        },
-                        "appointment_type": {
-                            "type": "string",
-                            "description": "Type of appointment",
-                            "enum": ["consultation", "follow_up", "assessment"],
-                            "default": "consultation"
-                        },
-                        "description": {
-                            "type": "string",
-                            "description": "Additional notes or description",
-                            "default": ""
-                        }
-                    },
-                    "required": ["customer_name", "customer_email", "start_datetime"]
-                }
-            ),
-            
-            llm.FunctionContext(
-                name="modify_appointment",
-                description="Modify an existing appointment",
-                parameters={
-                    "type": "object",
-                    "properties": {
-                        "event_id": {
-                            "type": "string",
-                            "description": "Google Calendar event ID"
-                        },
-                        "start_datetime": {
-                            "type": "string",
-                            "description": "New appointment start time in ISO format"
-                        },
-                        "description": {
-                            "type": "string",
-                            "description": "Updated description"
-                        }
-                    },
-                    "required": ["event_id"]
-                }
-            ),
-            
-            llm.FunctionContext(
-                name="cancel_appointment",
-                description="Cancel an appointment",
-                parameters={
-                    "type": "object",
-                    "properties": {
-                        "event_id": {
-                            "type": "string",
-                            "description": "Google Calendar event ID to cancel"
-                        }
-                    },
-                    "required": ["event_id"]
-                }
-            ),
-            
-            llm.FunctionContext(
-                name="get_upcoming_appointments",
-                description="Get upcoming appointments",
-                parameters={
-                    "type": "object",
-                    "properties": {
-                        "days_ahead": {
-                            "type": "integer",
-                            "description": "Number of days to look ahead (default: 7)",
-                            "default": 7
-                        }
-                    }
-                }
-            )
-        ]
+        # Tool name -> handler, used by execute_function
+        self._dispatch = {
+            "check_availability": self.check_availability,
+            "book_appointment": self.book_appointment,
+            "modify_appointment": self.modify_appointment,
+            "cancel_appointment": self.cancel_appointment,
+            "get_upcoming_appointments": self.get_upcoming_appointments
+        }
+        
+        self.actions = _CALENDAR_ACTIONS
     
     async def check_availability(self, date: str, duration: int = 60) -> str:
         """
@@ -150,27 +226,18 @@ class CalendarAgentActions:
             Formatted availability response
         """
         try:
-            # Run in thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
-            slots = await loop.run_in_executor(
-                None, 
-                self.calendar.check_availability, 
-                date, 
-                duration
-            )
+            # The shared integration caches the day's events and drops them on any write
+            slots = await self.calendar.check_availability(date, duration)
             
             if not slots:
                 return f"No available slots found for {date}. Please try another date."
             
-            # Format response
-            slot_list = []
-            for slot in slots[:5]:  # Limit to 5 slots
-                slot_list.append(f"• {slot['start_time']} - {slot['end_time']}")
-            
-            return f"Available slots for {date}:\n" + "\n".join(slot_list)
+            # Format response, limited to 5 slots
+            body = "\n".join(f"• {slot['start_time']} - {slot['end_time']}" for slot in islice(slots, 5))
+            return f"Available slots for {date}:\n{body}"
             
         except Exception as e:
-            return f"Error checking availability: {str(e)}"
+            return _ERR.format(op="checking availability", msg=e)
     
     async def book_appointment(self, 
                              customer_name: str,
@@ -192,10 +259,7 @@ class CalendarAgentActions:
             Booking confirmation message
         """
         try:
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(
-                None,
-                self.calendar.book_appointment,
+            result = await self.calendar.book_appointment(
                 customer_name,
                 customer_email,
                 start_datetime,
@@ -204,16 +268,13 @@ class CalendarAgentActions:
             )
             
             if result['success']:
-                return (f"✅ Appointment booked successfully!\n"
-                       f"Customer: {customer_name}\n"
-                       f"Time: {result['start_time']}\n"
-                       f"Type: {appointment_type.title()}\n"
-                       f"A calendar invite has been sent to {customer_email}")
+                return _BOOK_OK.format(name=customer_name, start=result['start_time'],
+                                       type=appointment_type.title(), email=customer_email)
             else:
-                return f"❌ Failed to book appointment: {result['message']}"
+                return _FAILED.format(op="book appointment", msg=result['message'])
                 
         except Exception as e:
-            return f"Error booking appointment: {str(e)}"
+            return _ERR.format(op="booking appointment", msg=e)
     
     async def modify_appointment(self, 
                                event_id: str,
@@ -237,21 +298,15 @@ class CalendarAgentActions:
             if description:
                 updates['description'] = description
             
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(
-                None,
-                self.calendar.modify_appointment,
-                event_id,
-                **updates
-            )
+            result = await self.calendar.modify_appointment(event_id, **updates)
             
             if result['success']:
-                return "✅ Appointment updated successfully! Updated calendar invite sent."
+                return _MODIFY_OK
             else:
-                return f"❌ Failed to update appointment: {result['message']}"
+                return _FAILED.format(op="update appointment", msg=result['message'])
                 
         except Exception as e:
-            return f"Error updating appointment: {str(e)}"
+            return _ERR.format(op="updating appointment", msg=e)
     
     async def cancel_appointment(self, event_id: str) -> str:
         """
@@ -264,20 +319,15 @@ class CalendarAgentActions:
             Cancellation confirmation message
         """
         try:
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(
-                None,
-                self.calendar.cancel_appointment,
-                event_id
-            )
+            result = await self.calendar.cancel_appointment(event_id)
             
             if result['success']:
-                return "✅ Appointment cancelled successfully! Cancellation notice sent to all attendees."
+                return _CANCEL_OK
             else:
-                return f"❌ Failed to cancel appointment: {result['message']}"
+                return _FAILED.format(op="cancel appointment", msg=result['message'])
                 
         except Exception as e:
-            return f"Error cancelling appointment: {str(e)}"
+            return _ERR.format(op="cancelling appointment", msg=e)
     
     async def get_upcoming_appointments(self, days_ahead: int = 7) -> str:
         """
@@ -290,31 +340,26 @@ class CalendarAgentActions:
             Formatted list of upcoming appointments
         """
         try:
-            loop = asyncio.get_event_loop()
-            appointments = await loop.run_in_executor(
-                None,
-                self.calendar.get_upcoming_appointments,
-                days_ahead
-            )
+            appointments = await self.calendar.get_upcoming_appointments(days_ahead)
             
             if not appointments:
                 return f"No upcoming appointments in the next {days_ahead} days."
             
-            # Format response
-            apt_list = []
-            for apt in appointments:
-                start_time = datetime.fromisoformat(apt['start_time']).strftime('%Y-%m-%d %H:%M')
-                apt_list.append(f"• {start_time} - {apt['summary']}")
-            
-            return f"Upcoming appointments:\n" + "\n".join(apt_list)
+            # Format response; ISO "YYYY-MM-DDTHH:MM..." sliced instead of parsed
+            body = "\n".join(f"• {apt['start_time'][:16].replace('T', ' ')} - {apt['summary']}" for apt in appointments)
+            return f"Upcoming appointments:\n{body}"
             
         except Exception as e:
-            return f"Error getting appointments: {str(e)}"
+            return _ERR.format(op="getting appointments", msg=e)
     
     def get_function_contexts(self) -> List[llm.FunctionContext]:
         """Get all function contexts for LLM integration"""
         return self.actions
     
+    def get_function_contexts_json(self) -> bytes:
+        """Get the function context schema pre-serialized as UTF-8 JSON bytes"""
+        return _CALENDAR_ACTIONS_JSON
+    
     async def execute_function(self, function_name: str, **kwargs) -> str:
         """
         Execute a calendar function
@@ -326,15 +371,22 @@ class CalendarAgentActions:
         Returns:
             Function result as string
         """
-        if function_name == "check_availability":
-            return await self.check_availability(**kwargs)
-        elif function_name == "book_appointment":
-            return await self.book_appointment(**kwargs)
-        elif function_name == "modify_appointment":
-            return await self.modify_appointment(**kwargs)
-        elif function_name == "cancel_appointment":
-            return await self.cancel_appointment(**kwargs)
-        elif function_name == "get_upcoming_appointments":
-            return await self.get_upcoming_appointments(**kwargs)
-        else:
-            return f"Unknown function: {function_name}"
\ No newline at end of file
+        function = self._dispatch.get(function_name)
+        if function is None:
+            return f"Unknown function: {function_name}"
+        return await function(**kwargs)
+    
+    async def execute_functions(self, calls: List[Tuple[str, Dict[str, Any]]]) -> List[str]:
+        """
+        Execute several calendar functions concurrently
+        
+        Args:
+            calls: (function_name, arguments) pairs, e.g. parallel tool calls from the LLM
+            
+        Returns:
+            Function results as strings, in call order
+        """
+        # TaskGroup cancels the remaining calls if one fails or the caller is cancelled
+        async with asyncio.TaskGroup() as tg:
+            tasks = [tg.create_task(self.execute_function(name, **kwargs)) for name, kwargs in calls]
+        return [task.result() for task in tasks]
\ No newline at end of file
@@ -6,137 +6,73 @@ Enhances the support agent with specific careSetu knowledge
 import asyncio
 import logging
 from pathlib import Path
+from types import MappingProxyType
 from typing import Dict, Any, List
 
 from knowledge_base_chromadb_cloud import CloudKnowledgeBaseConnector, KnowledgeDocument
+from logging_setup import configure_logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class CareSetuKnowledgeEnhancer:
-    """
-    Enhances the careSetu knowledge base with specific information
-    extracted from PDFs and structured for better retrieval.
-    """
-    
-    def __init__(self, 
-                 api_key: str = 'ck-8qMvVqpxS2ZPiA4rDDrPtT4Gjer1vawnCHNqANwqyxaF',
-                 tenant: str = '952f5e15-854e-461e-83d1-3cef021c755c',
-                 database: str = 'Assembly_AI'):
-        """Initialize the knowledge enhancer."""
-        self.api_key = api_key
-        self.tenant = tenant
-        self.database = database
-        
-        # Initialize knowledge base connector
-        self.kb = CloudKnowledgeBaseConnector(
-            company_id="caresetu",
-            api_key=api_key,
-            tenant=tenant,
-            database=database
-        )
-    
-    async def enhance_knowledge_base(self):
-        """Enhance the knowledge base with structured careSetu information."""
-        logger.info("🔄 Enhancing careSetu knowledge base...")
-        
-        # Load existing knowledge base
-        await self.kb.load_knowledge_base()
-        
-        # Add structured FAQ documents
-        await self._add_structured_faqs()
-        
-        # Add structured procedures
-        await self._add_structured_procedures()
-        
-        # Add business information
-        await self._add_business_information()
-        
-        # Add service information
-        await self._add_service_information()
-        
-        logger.info("✅ careSetu knowledge base enhancement completed")
-    
-    async def _add_structured_faqs(self):
-        """Add structured FAQ documents for better retrieval."""
-        faqs = [
-            {
-                "question": "Who can use the CareSetu App?",
-                "answer": "Any adult above 18 years old. Minors must be added under a Primary User account.",
-                "category": "registration"
-            },
-            {
-                "question": "Can I browse without registering?",
-                "answer": "Yes. Non-registered users can browse, use the self-assessment tool, and share the app.",
-                "category": "registration"
-            },
-            {
-                "question": "What services does CareSetu offer?",
-                "answer": "Services include online consultation, lab/sample collection, drug delivery, home therapies, post-surgery care, and more.",
-                "category": "services"
-            },
-            {
-                "question": "Is my personal and medical data safe?",
-                "answer": "Yes. Data is encrypted and stored securely following privacy regulations.",
-                "category": "privacy"
-            },
-            {
-                "question": "How do I schedule an appointment?",
-                "answer": "Log in to the CareSetu App, choose a service (consultation, diagnostics, etc.), select a Healthcare Service Provider, and confirm your appointment.",
-                "category": "appointments"
-            },
-            {
-                "question": "What are your business hours?",
-                "answer": "Our digital platform is available 24/7. Healthcare Service Provider hours vary by provider and can be viewed in the app.",
-                "category": "general"
-            },
-            {
-                "question": "How do I contact customer support?",
-                "answer": "You can contact our support team at saket@jha.com or through the Help section in the CareSetu App.",
-                "category": "support"
-            },
-            {
-                "question": "What is your cancellation policy?",
-                "answer": "Cancellation policies vary by Healthcare Service Provider. Generally, cancellations should be made at least 4 hours before the appointment to avoid cancellation fees.",
-                "category": "appointments"
-            }
-        ]
-        
-        for i, faq in enumerate(faqs):
-            doc_id = f"caresetu_faq_{i+1}"
-            
-            # Create document
-            doc = KnowledgeDocument(
-                id=doc_id,
-                title=f"FAQ: {faq['question']}",
-                content=f"Question: {faq['question']}\nAnswer: {faq['answer']}",
-                category="faqs",
-                tags=["faq", faq["category"], "question", "answer", "support"],
-                company_id="caresetu"
-            )
-            
-            # Add to knowledge base
-            await self.kb.add_document(doc)
-            logger.info(f"✅ Added FAQ document: {doc.title}")
-    
-    async def _add_structured_procedures(self):
-        """Add structured procedure documents."""
-        procedures = [
-            {
-                "title": "Registration Process",
-                "content": """
+# Static careSetu content, built once at import and read-only so no caller can alter it
+_FAQS = (
+    MappingProxyType({
+        "question": "Who can use the CareSetu App?",
+        "answer": "Any adult above 18 years old. Minors must be added under a Primary User account.",
+        "category": "registration"
+    }),
+    MappingProxyType({
+        "question": "Can I browse without registering?",
+        "answer": "Yes. Non-registered users can browse, use the self-assessment tool, and share the app.",
+        "category": "registration"
+    }),
+    MappingProxyType({
+        "question": "What services does CareSetu offer?",
+        "answer": "Services include online consultation, lab/sample collection, drug delivery, home therapies, post-surgery care, and more.",
+        "category": "services"
+    }),
+    MappingProxyType({
+        "question": "Is my personal and medical data safe?",
+        "answer": "Yes. Data is encrypted and stored securely following privacy regulations.",
+        "category": "privacy"
+    }),
+    MappingProxyType({
+        "question": "How do I schedule an appointment?",
+        "answer": "Log in to the CareSetu App, choose a service (consultation, diagnostics, etc.), select a Healthcare Service Provider, and confirm your appointment.",
+        "category": "appointments"
+    }),
+    MappingProxyType({
+        "question": "What are your business hours?",
+        "answer": "Our digital platform is available 24/7. Healthcare Service Provider hours vary by provider and can be viewed in the app.",
+        "category": "general"
+    }),
+    MappingProxyType({
+        "question": "How do I contact customer support?",
+        "answer": "You can contact our support team at saket@jha.com or through the Help section in the CareSetu App.",
+        "category": "support"
+    }),
+    MappingProxyType({
+        "question": "What is your cancellation policy?",
+        "answer": "Cancellation policies vary by Healthcare Service Provider. Generally, cancellations should be made at least 4 hours before the appointment to avoid cancellation fees.",
+        "category": "appointments"
+    })
+)
+
+_PROCEDURES = (
+    MappingProxyType({
+        "title": "Registration Process",
+        "content": """
                 Registration Process for CareSetu:
                 1. Download and install the CareSetu App from Play Store or App Store.
                 2. Register as a Primary User (must be an adult, 18+).
                 3. Add Secondary Users if needed (for family members).
                 4. HSP Registered Users are assigned a UHID/UMR.
                 """,
-                "category": "registration"
-            },
-            {
-                "title": "Booking Appointments",
-                "content": """
+        "category": "registration"
+    }),
+    MappingProxyType({
+        "title": "Booking Appointments",
+        "content": """
                 How to Book Appointments on CareSetu:
                 1. Log in using your credentials.
                 2. Choose service: consultation, diagnostics, medicine delivery, etc.
@@ -144,11 +80,11 @@ class CareSetuKnowledgeEnhancer:
                 4. Choose available date and time slot.
                 5. Confirm appointment and make payment if necessary.
                 """,
-                "category": "appointments"
-            },
-            {
-                "title": "Uploading Prescriptions",
-                "content": """
+        "category": "appointments"
+    }),
+    MappingProxyType({
+        "title": "Uploading Prescriptions",
+        "content": """
                 How to Upload Prescriptions on CareSetu:
                 1. Navigate to Health Records section.
                 2. Select "Upload Prescription" option.
@@ -156,11 +92,11 @@ class CareSetuKnowledgeEnhancer:
                 4. Add relevant details like doctor name and date.
                 5. Submit for processing.
                 """,
-                "category": "records"
-            },
-            {
-                "title": "Cancellation Process",
-                "content": """
+        "category": "records"
+    }),
+    MappingProxyType({
+        "title": "Cancellation Process",
+        "content": """
                 How to Cancel Appointments on CareSetu:
                 1. Go to the Bookings section in the app.
                 2. Find the appointment you wish to cancel.
@@ -170,32 +106,13 @@ class CareSetuKnowledgeEnhancer:
                 
                 Note: Cancellations should be made at least 4 hours before the appointment to avoid cancellation fees.
                 """,
-                "category": "appointments"
-            }
-        ]
-        
-        for i, procedure in enumerate(procedures):
-            doc_id = f"caresetu_procedure_{i+1}"
-            
-            # Create document
-            doc = KnowledgeDocument(
-                id=doc_id,
-                title=procedure["title"],
-                content=procedure["content"],
-                category="procedures",
-                tags=["procedure", procedure["category"], "workflow", "steps", "guide"],
-                company_id="caresetu"
-            )
-            
-            # Add to knowledge base
-            await self.kb.add_document(doc)
-            logger.info(f"✅ Added procedure document: {doc.title}")
-    
-    async def _add_business_information(self):
-        """Add business information documents."""
-        business_info = {
-            "title": "CareSetu Business Information",
-            "content": """
+        "category": "appointments"
+    })
+)
+
+_BUSINESS_INFO = MappingProxyType({
+    "title": "CareSetu Business Information",
+    "content": """
             CareSetu - Business Information
             
             Company Details:
@@ -214,29 +131,13 @@ class CareSetuKnowledgeEnhancer:
             - Website: www.caresetu.com
             - App: Available on Play Store and App Store
             """,
-            "category": "general",
-            "tags": ["business", "hours", "contact", "company", "information"]
-        }
-        
-        # Create document
-        doc = KnowledgeDocument(
-            id="caresetu_business_info",
-            title=business_info["title"],
-            content=business_info["content"],
-            category="general",
-            tags=business_info["tags"],
-            company_id="caresetu"
-        )
-        
-        # Add to knowledge base
-        await self.kb.add_document(doc)
-        logger.info(f"✅ Added business information document: {doc.title}")
-    
-    async def _add_service_information(self):
-        """Add service information documents."""
-        services = {
-            "title": "CareSetu Services",
-            "content": """
+    "category": "general",
+    "tags": ("business", "hours", "contact", "company", "information")
+})
+
+_SERVICES = MappingProxyType({
+    "title": "CareSetu Services",
+    "content": """
             CareSetu Services
             
             Healthcare Services Available:
@@ -257,23 +158,116 @@ class CareSetuKnowledgeEnhancer:
             Service Hours:
             Digital platform is available 24/7, but actual service hours depend on the healthcare provider's availability.
             """,
-            "category": "services",
-            "tags": ["services", "healthcare", "consultation", "diagnostics", "medicine", "delivery"]
-        }
+    "category": "services",
+    "tags": ("services", "healthcare", "consultation", "diagnostics", "medicine", "delivery")
+})
+
+class CareSetuKnowledgeEnhancer:
+    """
+    Enhances the careSetu knowledge base with specific information
+    extracted from PDFs and structured for better retrieval.
+    """
+    
+    def __init__(self, 
+                 api_key: str = 'ck-8qMvVqpxS2ZPiA4rDDrPtT4Gjer1vawnCHNqANwqyxaF',
+                 tenant: str = '952f5e15-854e-461e-83d1-3cef021c755c',
+                 database: str = 'Assembly_AI'):
+        """Initialize the knowledge enhancer."""
+        self.api_key = api_key
+        self.tenant = tenant
+        self.database = database
+        
+        # Initialize knowledge base connector
+        self.kb = CloudKnowledgeBaseConnector(
+            company_id="caresetu",
+            api_key=api_key,
+            tenant=tenant,
+            database=database
+        )
+    
+    async def enhance_knowledge_base(self):
+        """Enhance the knowledge base with structured careSetu information."""
+        logger.info("🔄 Enhancing careSetu knowledge base...")
         
-        # Create document
-        doc = KnowledgeDocument(
+        # Load existing knowledge base
+        await self.kb.load_knowledge_base()
+        
+        # Collect FAQ, procedure, business and service documents
+        docs = [
+            *self._structured_faq_documents(),
+            *self._structured_procedure_documents(),
+            self._business_information_document(),
+            self._service_information_document()
+        ]
+        
+        # Add everything to the knowledge base in one request
+        await self._add_documents(docs)
+        
+        logger.info("✅ careSetu knowledge base enhancement completed")
+    
+    async def _add_documents(self, docs: List[KnowledgeDocument]):
+        """Add documents through the connector, in a single bulk call when it supports one."""
+        # The connector owns embedding and metadata format, so writes always go through it
+        if hasattr(self.kb, "add_documents"):
+            await self.kb.add_documents(docs)
+        else:
+            # Overlap the per-document round trips
+            await asyncio.gather(*(self.kb.add_document(doc) for doc in docs))
+        
+        logger.info("✅ Added %d documents", len(docs))
+        if logger.isEnabledFor(logging.DEBUG):
+            for doc in docs:
+                logger.debug("Added %s document: %s", doc.category, doc.title)
+    
+    def _structured_faq_documents(self) -> List[KnowledgeDocument]:
+        """Build structured FAQ documents for better retrieval."""
+        return [
+            KnowledgeDocument(
+                id=f"caresetu_faq_{i+1}",
+                title=f"FAQ: {faq['question']}",
+                content=f"Question: {faq['question']}\nAnswer: {faq['answer']}",
+                category="faqs",
+                tags=["faq", faq["category"], "question", "answer", "support"],
+                company_id="caresetu"
+            )
+            for i, faq in enumerate(_FAQS)
+        ]
+    
+    def _structured_procedure_documents(self) -> List[KnowledgeDocument]:
+        """Build structured procedure documents."""
+        return [
+            KnowledgeDocument(
+                id=f"caresetu_procedure_{i+1}",
+                title=procedure["title"],
+                content=procedure["content"],
+                category="procedures",
+                tags=["procedure", procedure["category"], "workflow", "steps", "guide"],
+                company_id="caresetu"
+            )
+            for i, procedure in enumerate(_PROCEDURES)
+        ]
+    
+    def _business_information_document(self) -> KnowledgeDocument:
+        """Build the business information document."""
+        return KnowledgeDocument(
+            id="caresetu_business_info",
+            title=_BUSINESS_INFO["title"],
+            content=_BUSINESS_INFO["content"],
+            category="general",
+            tags=list(_BUSINESS_INFO["tags"]),
+            company_id="caresetu"
+        )
+    
+    def _service_information_document(self) -> KnowledgeDocument:
+        """Build the service information document."""
+        return KnowledgeDocument(
             id="caresetu_services",
-            title=services["title"],
-            content=services["content"],
+            title=_SERVICES["title"],
+            content=_SERVICES["content"],
             category="general",
-            tags=services["tags"],
+            tags=list(_SERVICES["tags"]),
             company_id="caresetu"
         )
-        
-        # Add to knowledge base
-        await self.kb.add_document(doc)
-        logger.info(f"✅ Added services information document: {doc.title}")
 
 async def main():
     """Main function to enhance careSetu knowledge base."""
@@ -294,4 +288,8 @@ async def main():
     print("\nTry testing the support agent again with specific questions!")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    listener = configure_logging()
+    try:
+        asyncio.run(main())
+    finally:
+        listener.stop()
\ No newline at end of file
@@ -6,23 +6,49 @@ Ready for production use with your existing LiveKit setup
 import asyncio
 import logging
 import os
-from typing import Dict, Any, Optional
+import re
+import sys
+import textwrap
+from typing import Dict, Any, AsyncIterator, Optional
 from enhanced_voice_agent import EnhancedVoiceAgent
+from logging_setup import configure_logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("complete-agent")
 
+# Customer details mentioned in conversation (basic patterns; in production, use better NLP)
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+_NAME_RE = re.compile(r"(?:^|\s)(?:my name is|i'm|this is)\s+([a-z]+(?:\s+[a-z]+)?)", re.IGNORECASE)
+
+_SYSTEM_PROMPT = textwrap.dedent("""\
+    You are a professional customer service agent for CareSetu Healthcare.
+
+    You have access to real-time calendar scheduling capabilities and can:
+    - Check appointment availability
+    - Book appointments immediately
+    - Handle appointment modifications
+    - Provide business hours information
+
+    Always be helpful, professional, and efficient. When booking appointments:
+    1. Get customer name and email
+    2. Confirm preferred date/time
+    3. Book the appointment
+    4. Confirm details
+
+    Google Calendar will automatically send confirmation emails and reminders.
+""")
+
 class CompleteVoiceAgent:
     """
     Complete voice agent that integrates calendar with your existing systems
     """
     
+    # One instance per participant, so keep the per-session footprint minimal
+    __slots__ = ('enhanced_agent', 'customer_id')
+    
     def __init__(self):
         """Initialize the complete agent"""
         self.enhanced_agent = EnhancedVoiceAgent()
-        self.conversation_state = {}
-        self.customer_session = {}
+        self.customer_id: Optional[str] = None
         
     async def handle_voice_input(self, transcript: str, customer_id: str = None) -> str:
         """
@@ -36,50 +62,76 @@ class CompleteVoiceAgent:
             Response text for TTS
         """
         try:
-            # Store customer session
+            # Store customer session (ids repeat every turn, so share one string object)
             if customer_id:
-                self.customer_session['id'] = customer_id
+                self.customer_id = sys.intern(customer_id)
             
             # Extract customer info from conversation if available
-            await self._extract_customer_info(transcript)
+            self._extract_customer_info(transcript)
             
             # Process the message
             response = await self.enhanced_agent.process_message(transcript)
             
             # Log the interaction
-            logger.info(f"Customer: {transcript}")
-            logger.info(f"Agent: {response}")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Customer: %s", transcript)
+                logger.info("Agent: %s", response)
             
             return response
             
         except Exception as e:
-            logger.error(f"Error handling voice input: {e}")
+            logger.error("Error handling voice input: %s", e)
             return "I apologize, but I encountered an issue. Could you please repeat that?"
     
-    async def _extract_customer_info(self, transcript: str):
+    async def handle_voice_input_stream(self, transcript: str, customer_id: str = None) -> AsyncIterator[str]:
+        """
+        Streaming variant of handle_voice_input
+        
+        Args:
+            transcript: Speech-to-text transcript
+            customer_id: Optional customer identifier
+            
+        Yields:
+            Response text chunks for TTS, in order
+        """
+        chunks = []
+        try:
+            if customer_id:
+                self.customer_id = sys.intern(customer_id)
+            
+            self._extract_customer_info(transcript)
+            
+            async for chunk in self.enhanced_agent.process_message_stream(transcript):
+                chunks.append(chunk)
+                yield chunk
+            
+        except Exception as e:
+            logger.error("Error handling voice input: %s", e)
+            yield "I apologize, but I encountered an issue. Could you please repeat that?"
+            return
+        
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Customer: %s", transcript)
+            logger.info("Agent: %s", "".join(chunks))
+    
+    def _extract_customer_info(self, transcript: str):
         """Extract customer information from conversation"""
-        transcript_lower = transcript.lower()
+        # Nothing left to collect once both details are known
+        customer_info = self.enhanced_agent.customer_info
+        if customer_info.name and customer_info.email:
+            return
         
-        # Simple email extraction (in production, use better NLP)
-        if '@' in transcript:
-            words = transcript.split()
-            for word in words:
-                if '@' in word and '.' in word:
-                    self.enhanced_agent.update_customer_info(email=word)
-                    break
+        # Simple email extraction
+        match = _EMAIL_RE.search(transcript) if '@' in transcript else None
+        if match:
+            self.enhanced_agent.update_customer_info(email=match.group())
         
-        # Simple name extraction (basic implementation)
-        if any(phrase in transcript_lower for phrase in ['my name is', "i'm", 'this is']):
-            # Extract name after these phrases
-            for phrase in ['my name is', "i'm", 'this is']:
-                if phrase in transcript_lower:
-                    parts = transcript_lower.split(phrase)
-                    if len(parts) > 1:
-                        potential_name = parts[1].strip().split()[0:2]  # First two words
-                        name = ' '.join(potential_name).title()
-                        if name and len(name) > 1:
-                            self.enhanced_agent.update_customer_info(name=name)
-                    break
+        # Simple name extraction: up to two words after an introduction phrase
+        match = _NAME_RE.search(transcript)
+        if match:
+            name = match.group(1).title()
+            if len(name) > 1:
+                self.enhanced_agent.update_customer_info(name=name)
     
     def get_calendar_status(self) -> Dict[str, Any]:
         """Get calendar integration status"""
@@ -102,7 +154,8 @@ class CompleteVoiceAgent:
             return {'success': False, 'message': 'Calendar not available'}
         
         try:
-            result = self.enhanced_agent.calendar.book_appointment(
+            result = await asyncio.to_thread(
+                self.enhanced_agent.calendar.book_appointment,
                 customer_name=customer_name,
                 customer_email=customer_email,
                 start_datetime=datetime_str,
@@ -136,65 +189,96 @@ class LiveKitCalendarAgent:
         """
         return await self.complete_agent.handle_voice_input(transcript, participant_id)
     
-    def get_system_prompt(self) -> str:
-        """Get system prompt for LLM integration"""
-        return """
-        You are a professional customer service agent for CareSetu Healthcare.
+    async def on_speech_recognized_stream(self, transcript: str, tts_stream, participant_id: str = None) -> str:
+        """
+        Handle speech recognition from LiveKit, streaming the reply into TTS
         
-        You have access to real-time calendar scheduling capabilities and can:
-        - Check appointment availability
-        - Book appointments immediately
-        - Handle appointment modifications
-        - Provide business hours information
+        Each chunk is pushed as soon as it is ready, so synthesis of the first
+        line overlaps with building the rest of the reply.
+        
+        Args:
+            transcript: STT transcript
+            tts_stream: LiveKit TTS SynthesizeStream
+            participant_id: LiveKit participant ID
+            
+        Returns:
+            Full response text
+        """
+        chunks = []
+        async for chunk in self.complete_agent.handle_voice_input_stream(transcript, participant_id):
+            tts_stream.push_text(chunk)
+            chunks.append(chunk)
+        tts_stream.flush()
+        return "".join(chunks)
+    
+    async def on_partial_transcript(self, partial: str):
+        """
+        Handle interim STT results from LiveKit
         
-        Always be helpful, professional, and efficient. When booking appointments:
-        1. Get customer name and email
-        2. Confirm preferred date/time
-        3. Book the appointment
-        4. Confirm details
+        Starts the calendar lookup for an availability question before the
+        final transcript arrives, so the answer is usually already cached.
         
-        Google Calendar will automatically send confirmation emails and reminders.
+        Args:
+            partial: Partial STT transcript
         """
+        self.complete_agent.enhanced_agent.prefetch_availability(partial)
+    
+    def get_system_prompt(self) -> str:
+        """Get system prompt for LLM integration"""
+        return _SYSTEM_PROMPT
 
 # Testing and demonstration
-async def test_complete_integration():
-    """Test the complete integration"""
+_CONVERSATION = (
+    "Hi, I need to schedule an appointment",
+    "My name is John Doe",
+    "My email is john.doe@example.com", 
+    "What times are available tomorrow?",
+    "2 PM works for me",
+    "Yes, please book it"
+)
+
+async def test_complete_integration(verbose: bool = True):
+    """
+    Test the complete integration
     
-    print("🚀 Testing Complete Voice Agent Integration")
-    print("=" * 55)
+    Args:
+        verbose: Print the conversation; disable to reuse this as a benchmark
+    """
+    if verbose:
+        print("🚀 Testing Complete Voice Agent Integration")
+        print("=" * 55)
     
     # Initialize complete agent
     agent = CompleteVoiceAgent()
     
-    # Test conversation flow
-    conversation = [
-        "Hi, I need to schedule an appointment",
-        "My name is John Doe",
-        "My email is john.doe@example.com", 
-        "What times are available tomorrow?",
-        "2 PM works for me",
-        "Yes, please book it"
-    ]
-    
-    print("🎭 Simulating Complete Conversation:")
-    print("-" * 40)
-    
-    for i, message in enumerate(conversation, 1):
-        print(f"\n👤 Customer: {message}")
+    if verbose:
+        print("🎭 Simulating Complete Conversation:")
+        print("-" * 40)
+    
+    # Turns build on each other's customer details, so they run in order
+    for i, message in enumerate(_CONVERSATION, 1):
         response = await agent.handle_voice_input(message, f"customer_{i}")
-        print(f"🤖 Agent: {response}")
+        if verbose:
+            print(f"\n👤 Customer: {message}")
+            print(f"🤖 Agent: {response}")
     
     # Test calendar status
-    print(f"\n📊 Calendar Status:")
     status = agent.get_calendar_status()
-    print(f"   Calendar Available: {status['calendar_available']}")
-    if status['business_hours']:
-        print(f"   Business Hours: {status['business_hours']}")
+    if verbose:
+        print(f"\n📊 Calendar Status:")
+        print(f"   Calendar Available: {status['calendar_available']}")
+        if status['business_hours']:
+            print(f"   Business Hours: {status['business_hours']}")
     
     # Test quick availability
-    print(f"\n⚡ Quick Availability Check:")
     availability = await agent.quick_availability_check()
-    print(f"   {availability}")
+    if verbose:
+        print(f"\n⚡ Quick Availability Check:")
+        print(f"   {availability}")
 
 if __name__ == "__main__":
-    asyncio.run(test_complete_integration())
\ No newline at end of file
+    listener = configure_logging()
+    try:
+        asyncio.run(test_complete_integration())
+    finally:
+        listener.stop()
\ No newline at end of file
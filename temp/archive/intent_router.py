@@ -1,15 +1,75 @@
 """Intent detection and routing for business conversations."""
 
+import asyncio
 import logging
-from typing import Dict, Any, Optional
+import re
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Any, List, Optional
 from dataclasses import dataclass
 from enum import Enum
 from livekit.agents import llm
 
+# Optional C keyword automaton; falls back to one compiled regex alternation
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# Optional embedding model for the semantic intent cache
+try:
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+    SENTENCE_TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    SENTENCE_TRANSFORMERS_AVAILABLE = False
+
 # Intent router now works independently without support agent module
 
 logger = logging.getLogger(__name__)
 
+# Semantic cache for LLM-classified intents
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+SEMANTIC_CACHE_THRESHOLD = 0.92
+SEMANTIC_CACHE_TTL = 3600
+SEMANTIC_CACHE_SIZE = 512
+
+# Conversation context bounds: sessions idle longer than the TTL are dropped
+MAX_CONVERSATION_CONTEXTS = 10_000
+CONVERSATION_CONTEXT_TTL = 3600
+MAX_CONVERSATION_HISTORY = 50
+
+# Fixed part of the LLM classification prompt; only the customer message is appended
+INTENT_CLASSIFICATION_INSTRUCTIONS = """\
+Analyze the customer message below and determine their primary intent.
+
+Choose ONE of these intents:
+- SUPPORT: Customer needs help with a problem, has questions, or needs technical assistance
+- SCHEDULING: Customer wants to book, reschedule, cancel, or check appointment availability
+- ESCALATION: Customer wants to speak with a human, manager, or is expressing frustration
+- GENERAL: General inquiry or greeting that doesn't fit other categories
+
+Consider the context:
+- This is a business phone call
+- Customer may use casual language
+- Intent should be based on what they actually need
+
+Respond with just the intent name: SUPPORT, SCHEDULING, ESCALATION, or GENERAL
+"""
+
+# Keyword groups used inside the handlers, matched in the same pass as intents
+SCHEDULING_ACTION_KEYWORDS = {
+    "cancel": frozenset({"cancel", "cancellation"}),
+    "reschedule": frozenset({"reschedule", "change", "move"}),
+    "availability": frozenset({"availability", "available", "when"})
+}
+GREETING_KEYWORDS = frozenset({"hello", "hi", "hey", "good morning", "good afternoon", "good evening"})
+
+# Fixed score slots for the handler groups; intent slots follow from _INTENT_SLOT_START
+_CANCEL, _RESCHEDULE, _AVAILABILITY, _GREETING = range(4)
+_INTENT_SLOT_START = 4
+
 class IntentType(Enum):
     """Types of customer intents."""
     SUPPORT = "support"
@@ -18,20 +78,30 @@ class IntentType(Enum):
     ESCALATION = "escalation"
     UNKNOWN = "unknown"
 
+# Labels the classification prompt allows the LLM to answer with
+_LLM_INTENT_LABELS = {
+    "SUPPORT": IntentType.SUPPORT,
+    "SCHEDULING": IntentType.SCHEDULING,
+    "ESCALATION": IntentType.ESCALATION,
+    "GENERAL": IntentType.GENERAL
+}
+_LABEL_PUNCTUATION = ".,:;!*\"'`"
+
 @dataclass
 class ConversationContext:
     """Context for ongoing conversation."""
     session_id: str = ""
     current_intent: IntentType = IntentType.UNKNOWN
     customer_info: Dict[str, Any] = None
-    conversation_history: list = None
+    conversation_history: deque = None
     business_data: Dict[str, Any] = None
+    last_active: float = 0.0
     
     def __post_init__(self):
         if self.customer_info is None:
             self.customer_info = {}
         if self.conversation_history is None:
-            self.conversation_history = []
+            self.conversation_history = deque(maxlen=MAX_CONVERSATION_HISTORY)
         if self.business_data is None:
             self.business_data = {}
 
@@ -41,7 +111,8 @@ class IntentRouter:
     def __init__(self, llm_instance: llm.LLM):
         """Initialize intent router with LLM for intent detection."""
         self.llm = llm_instance
-        self.conversation_contexts: Dict[str, ConversationContext] = {}
+        # Least recently active session first
+        self.conversation_contexts: OrderedDict[str, ConversationContext] = OrderedDict()
         
         # Intent router works independently now
         
@@ -65,6 +136,119 @@ class IntentRouter:
                 "speak to", "talk to", "transfer", "connect me"
             ]
         }
+        
+        # Keyword -> every score slot it counts toward (handler groups, then one per intent)
+        self._slot_intents = tuple(self.intent_keywords)
+        slot_keywords = (
+            SCHEDULING_ACTION_KEYWORDS["cancel"], SCHEDULING_ACTION_KEYWORDS["reschedule"],
+            SCHEDULING_ACTION_KEYWORDS["availability"], GREETING_KEYWORDS,
+            *self.intent_keywords.values()
+        )
+        self._keyword_groups: Dict[str, tuple] = {}
+        for slot, keywords in enumerate(slot_keywords):
+            for keyword in keywords:
+                self._keyword_groups[keyword] = self._keyword_groups.get(keyword, ()) + (slot,)
+        self._slot_count = len(slot_keywords)
+        
+        # One automaton over all keywords, so a single pass over the text finds every hit
+        self._automaton = None
+        if AHOCORASICK_AVAILABLE:
+            self._automaton = ahocorasick.Automaton()
+            for keyword, groups in self._keyword_groups.items():
+                self._automaton.add_word(keyword, (keyword, groups))
+            self._automaton.make_automaton()
+        else:
+            # Lookahead finds the longest keyword starting at each position; any other keyword
+            # starting there is one of its prefixes, so expanding to those keeps every substring hit
+            alternation = "|".join(map(re.escape, sorted(self._keyword_groups, key=len, reverse=True)))
+            self._keyword_pattern = re.compile(rf"(?=({alternation}))")
+            self._keyword_prefixes = {
+                keyword: tuple(prefix for prefix in self._keyword_groups if keyword.startswith(prefix))
+                for keyword in self._keyword_groups
+            }
+        
+        # Intent -> handler dispatch table
+        self._intent_handlers = {
+            IntentType.SUPPORT: self._handle_support_intent,
+            IntentType.SCHEDULING: self._handle_scheduling_intent,
+            IntentType.ESCALATION: self._handle_escalation_intent,
+            IntentType.GENERAL: self._handle_general_intent
+        }
+        
+        # (expires_at, normalized embedding, intent) for messages the LLM already classified
+        self._embedder = None
+        self._intent_cache: deque = deque(maxlen=SEMANTIC_CACHE_SIZE)
+    
+    def _keyword_hits(self, text_lower: str) -> List[int]:
+        """
+        Count the distinct keywords of each group found in a lowercased message.
+        
+        Args:
+            text_lower: Lowercased customer message
+            
+        Returns:
+            Keyword hits per score slot (_CANCEL.._GREETING, then one per intent)
+        """
+        if self._automaton is not None:
+            matched = {keyword for _, (keyword, _) in self._automaton.iter(text_lower)}
+        else:
+            matched = {
+                prefix
+                for match in self._keyword_pattern.finditer(text_lower)
+                for prefix in self._keyword_prefixes[match.group(1)]
+            }
+        
+        hits = [0] * self._slot_count
+        for keyword in matched:
+            for slot in self._keyword_groups[keyword]:
+                hits[slot] += 1
+        return hits
+    
+    def classify_batch(self, texts: List[str]) -> List[IntentType]:
+        """
+        Classify many messages by keywords only, for offline analytics.
+        
+        Args:
+            texts: Customer messages, e.g. taken from conversation histories
+            
+        Returns:
+            Keyword intent per message (UNKNOWN when no keyword matches; no LLM calls)
+        """
+        intents = []
+        for text in texts:
+            scores = self._keyword_hits(text.lower())[_INTENT_SLOT_START:]
+            best = max(scores)
+            intents.append(self._slot_intents[scores.index(best)] if best else IntentType.UNKNOWN)
+        return intents
+    
+    def _encode(self, text: str):
+        """Embed a message with the sentence model, loading it on first use."""
+        if self._embedder is None:
+            self._embedder = SentenceTransformer(EMBEDDING_MODEL)
+        return self._embedder.encode(text, normalize_embeddings=True, convert_to_numpy=True)
+    
+    def _cached_intent(self, embedding) -> Optional[IntentType]:
+        """
+        Look up the intent of a previously classified, near-identical message.
+        
+        Args:
+            embedding: Normalized embedding of the lowercased message
+            
+        Returns:
+            Cached intent if a live entry is similar enough, otherwise None
+        """
+        now = time.monotonic()
+        while self._intent_cache and self._intent_cache[0][0] <= now:
+            self._intent_cache.popleft()
+        if not self._intent_cache:
+            return None
+        
+        # Embeddings are normalized, so the dot product is the cosine similarity
+        sims = np.stack([entry[1] for entry in self._intent_cache]) @ embedding
+        best = int(sims.argmax())
+        if sims[best] > SEMANTIC_CACHE_THRESHOLD:
+            return self._intent_cache[best][2]
+        return None
     
     async def detect_intent(self, user_text: str, context: Dict[str, Any]) -> IntentType:
         """
@@ -78,54 +262,45 @@ class IntentRouter:
             Detected intent type
         """
         
-        user_text_lower = user_text.lower()
-        
         # First, check for keyword matches (fast path)
-        keyword_scores = {}
-        for intent, keywords in self.intent_keywords.items():
-            score = sum(1 for keyword in keywords if keyword in user_text_lower)
-            if score > 0:
-                keyword_scores[intent] = score
-        
-        # If we have clear keyword matches, use them
-        if keyword_scores:
-            best_intent = max(keyword_scores.items(), key=lambda x: x[1])[0]
+        scores = self._keyword_hits(user_text.lower())[_INTENT_SLOT_START:]
+        
+        # If we have clear keyword matches, use them (ties go to the earlier intent)
+        if any(scores):
+            best_intent = self._slot_intents[scores.index(max(scores))]
             logger.info(f"🎯 Intent detected via keywords: {best_intent.value}")
             return best_intent
         
+        # Reuse the LLM's answer for near-duplicate messages
+        embedding = None
+        if SENTENCE_TRANSFORMERS_AVAILABLE:
+            try:
+                embedding = await asyncio.to_thread(self._encode, user_text.lower())
+                cached_intent = self._cached_intent(embedding)
+                if cached_intent is not None:
+                    logger.info(f"💾 Intent detected via semantic cache: {cached_intent.value}")
+                    return cached_intent
+            except Exception as e:
+                logger.error(f"Error in semantic intent cache: {e}")
+                embedding = None
+        
         # Use LLM for more nuanced intent detection
         try:
-            intent_prompt = f"""
-            Analyze this customer message and determine their primary intent:
-
-            Customer message: "{user_text}"
-            
-            Choose ONE of these intents:
-            - SUPPORT: Customer needs help with a problem, has questions, or needs technical assistance
-            - SCHEDULING: Customer wants to book, reschedule, cancel, or check appointment availability  
-            - ESCALATION: Customer wants to speak with a human, manager, or is expressing frustration
-            - GENERAL: General inquiry or greeting that doesn't fit other categories
-            
-            Consider the context:
-            - This is a business phone call
-            - Customer may use casual language
-            - Intent should be based on what they actually need
-            
-            Respond with just the intent name: SUPPORT, SCHEDULING, ESCALATION, or GENERAL
-            """
+            # Static instructions first, message last, so the provider can reuse the prefix
+            intent_prompt = f'{INTENT_CLASSIFICATION_INSTRUCTIONS}\nCustomer message: "{user_text}"\n'
             
             response = await self.llm.achat(intent_prompt)
-            intent_text = response.content.strip().upper()
-            
-            # Map response to enum
-            intent_mapping = {
-                "SUPPORT": IntentType.SUPPORT,
-                "SCHEDULING": IntentType.SCHEDULING,
-                "ESCALATION": IntentType.ESCALATION,
-                "GENERAL": IntentType.GENERAL
-            }
+            usage = getattr(response, "usage", None)
+            if usage is not None and logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Intent prompt cached tokens: %s",
+                             getattr(usage, "cache_read_input_tokens", None) or getattr(usage, "cached_tokens", None))
             
-            detected_intent = intent_mapping.get(intent_text, IntentType.UNKNOWN)
+            # Map the label (first word, ignoring case and punctuation) to the enum
+            words = response.content.split(maxsplit=1)
+            intent_text = words[0].strip(_LABEL_PUNCTUATION).upper() if words else ""
+            detected_intent = _LLM_INTENT_LABELS.get(intent_text, IntentType.UNKNOWN)
+            if embedding is not None and detected_intent is not IntentType.UNKNOWN:
+                self._intent_cache.append((time.monotonic() + SEMANTIC_CACHE_TTL, embedding, detected_intent))
             logger.info(f"🤖 Intent detected via LLM: {detected_intent.value}")
             return detected_intent
             
@@ -147,10 +322,7 @@ class IntentRouter:
         
         # Get or create conversation context
         session_id = context.get("room_name", "default")
-        if session_id not in self.conversation_contexts:
-            self.conversation_contexts[session_id] = ConversationContext(session_id=session_id)
-        
-        conv_context = self.conversation_contexts[session_id]
+        conv_context = self._touch_conversation_context(session_id)
         
         # Detect intent
         detected_intent = await self.detect_intent(user_text, context)
@@ -183,15 +355,11 @@ class IntentRouter:
             Routing information or response guidance
         """
         
-        routing_responses = {
-            IntentType.SUPPORT: await self._handle_support_intent(user_text, context),
-            IntentType.SCHEDULING: await self._handle_scheduling_intent(user_text, context),
-            IntentType.ESCALATION: await self._handle_escalation_intent(user_text, context),
-            IntentType.GENERAL: await self._handle_general_intent(user_text, context),
-            IntentType.UNKNOWN: "I want to help you today. Could you tell me a bit more about what you need?"
-        }
-        
-        return routing_responses.get(intent, routing_responses[IntentType.UNKNOWN])
+        # Only the selected handler runs
+        handler = self._intent_handlers.get(intent)
+        if handler is None:
+            return "I want to help you today. Could you tell me a bit more about what you need?"
+        return await handler(user_text, context)
     
     async def _handle_support_intent(self, user_text: str, context: ConversationContext) -> str:
         """Handle customer support requests using the support agent module."""
@@ -224,14 +392,16 @@ class IntentRouter:
     async def _handle_scheduling_intent(self, user_text: str, context: ConversationContext) -> str:
         """Handle appointment scheduling requests."""
         
+        hits = self._keyword_hits(user_text.lower())
+        
         # Check if they want to book, reschedule, or cancel
-        if any(word in user_text.lower() for word in ["cancel", "cancellation"]):
+        if hits[_CANCEL]:
             return "I can help you cancel your appointment. Can you provide me with your appointment details or the date and time?"
         
-        elif any(word in user_text.lower() for word in ["reschedule", "change", "move"]):
+        elif hits[_RESCHEDULE]:
             return "I'd be happy to help you reschedule. What's your current appointment time, and when would you prefer to meet instead?"
         
-        elif any(word in user_text.lower() for word in ["availability", "available", "when"]):
+        elif hits[_AVAILABILITY]:
             return "I can check our availability for you. What type of appointment are you looking for, and do you have any preferred dates or times?"
         
         else:
@@ -247,15 +417,52 @@ class IntentRouter:
         """Handle general inquiries and greetings."""
         
         # Check for greetings
-        greetings = ["hello", "hi", "hey", "good morning", "good afternoon", "good evening"]
-        if any(greeting in user_text.lower() for greeting in greetings):
+        if self._keyword_hits(user_text.lower())[_GREETING]:
             return "Hello! Thank you for calling. I'm here to help with any questions or to schedule an appointment. How can I assist you today?"
         
         # General inquiry
         return "Thank you for calling. I'm here to help with customer support or appointment scheduling. What can I do for you today?"
     
+    def _touch_conversation_context(self, session_id: str) -> ConversationContext:
+        """
+        Get or create the context for a session and mark it as most recently active.
+        
+        Expired sessions are evicted first, then the least recently active
+        ones while the number of sessions exceeds MAX_CONVERSATION_CONTEXTS.
+        
+        Args:
+            session_id: Session (room) identifier
+            
+        Returns:
+            Conversation context for the session
+        """
+        now = time.monotonic()
+        self._evict_expired_contexts(now)
+        
+        conv_context = self.conversation_contexts.get(session_id)
+        if conv_context is None:
+            conv_context = ConversationContext(session_id=session_id)
+            self.conversation_contexts[session_id] = conv_context
+            while len(self.conversation_contexts) > MAX_CONVERSATION_CONTEXTS:
+                self.conversation_contexts.popitem(last=False)
+        else:
+            self.conversation_contexts.move_to_end(session_id)
+        
+        conv_context.last_active = now
+        return conv_context
+    
+    def _evict_expired_contexts(self, now: float):
+        """Drop sessions idle for longer than CONVERSATION_CONTEXT_TTL."""
+        cutoff = now - CONVERSATION_CONTEXT_TTL
+        while self.conversation_contexts:
+            oldest = next(iter(self.conversation_contexts.values()))
+            if oldest.last_active > cutoff:
+                break
+            self.conversation_contexts.popitem(last=False)
+    
     def get_conversation_context(self, session_id: str) -> Optional[ConversationContext]:
         """Get conversation context for a session."""
+        self._evict_expired_contexts(time.monotonic())
         return self.conversation_contexts.get(session_id)
     
     def clear_conversation_context(self, session_id: str):
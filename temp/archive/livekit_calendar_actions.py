@@ -5,20 +5,66 @@ Implements comprehensive scheduling engine with real-time availability and booki
 
 import asyncio
 import json
+import time
 from datetime import datetime, timedelta
+from functools import cache, lru_cache
 from typing import Dict, Any, List, Optional
 
 from google_calendar_integration import GoogleCalendarIntegration
 
+# Failure messages, shared by every result dict
+_FAIL_CHECK = "Failed to check availability"
+_FAIL_BOOK = "Failed to book appointment"
+_FAIL_CANCEL = "Failed to cancel appointment"
+_FAIL_UPCOMING = "Failed to retrieve appointments"
+
+def _failure(message: str, error: Exception) -> Dict[str, Any]:
+    """Build a failed action result"""
+    return {"success": False, "error": str(error), "message": message}
+
+@lru_cache(maxsize=1024)
+def _parse_start(preferred_date: str, preferred_time: str) -> str:
+    """Validate a date and HH:MM time locally and return the ISO start time"""
+    try:
+        return datetime.fromisoformat(f"{preferred_date}T{preferred_time}:00").isoformat()
+    except ValueError:
+        raise ValueError(f"Invalid date/time: {preferred_date} {preferred_time}") from None
+
+@lru_cache(maxsize=256)
+def _parse_date(date: str) -> str:
+    """Validate a YYYY-MM-DD date locally and return it normalized"""
+    try:
+        return datetime.strptime(date, "%Y-%m-%d").date().isoformat()
+    except ValueError:
+        raise ValueError(f"Invalid date: {date}") from None
+
+@cache
+def _get_calendar() -> GoogleCalendarIntegration:
+    """Process-wide calendar client; its HTTP connections are reused per worker thread"""
+    return GoogleCalendarIntegration()
+
+# Date -> (fetched_at, slots), non-empty only. Shared like the client, so a booking
+# or cancellation in any session clears it for all of them
+_avail_cache: Dict[str, tuple] = {}
+# days_ahead -> (fetched_at, [(appointment, lowercased attendee set)]), non-empty only; same sharing
+_upcoming_cache: Dict[int, tuple] = {}
+
 class LiveKitCalendarActions:
     """
     Calendar actions for LiveKit voice agent integration
     Provides real-time scheduling capabilities during voice conversations
     """
     
+    # Seconds a day's free slots are reused before asking Google Calendar again
+    AVAILABILITY_CACHE_TTL = 30
+    # Seconds the upcoming-appointments listing is reused across turns
+    UPCOMING_CACHE_TTL = 45
+    # Days ahead covered by the upcoming-appointments listing
+    UPCOMING_DAYS_AHEAD = 7
+    
     def __init__(self):
         """Initialize calendar actions with Google Calendar integration"""
-        self.calendar = GoogleCalendarIntegration()
+        self.calendar = _get_calendar()
         
     async def check_availability(self, date: str) -> Dict[str, Any]:
         """
@@ -31,7 +77,18 @@ class LiveKitCalendarActions:
             Dictionary with available slots
         """
         try:
-            slots = self.calendar.check_availability(date)
+            # Reject malformed dates before spending a calendar round trip
+            date = _parse_date(date)
+            hit = _avail_cache.get(date)
+            if hit and time.monotonic() - hit[0] < self.AVAILABILITY_CACHE_TTL:
+                slots = hit[1]
+            else:
+                now = time.monotonic()
+                # The client is blocking, so run it off the event loop
+                slots = await asyncio.to_thread(self.calendar.check_availability, date)
+                # The client also returns [] on API errors, so empty results are not cached
+                if slots:
+                    _avail_cache[date] = (now, slots)
             return {
                 "success": True,
                 "date": date,
@@ -39,11 +96,19 @@ class LiveKitCalendarActions:
                 "count": len(slots)
             }
         except Exception as e:
-            return {
-                "success": False,
-                "error": str(e),
-                "message": "Failed to check availability"
-            }
+            return _failure(_FAIL_CHECK, e)
+    
+    async def check_availability_multi(self, dates: List[str]) -> List[Dict[str, Any]]:
+        """
+        Check availability for several dates concurrently
+        
+        Args:
+            dates: Dates in YYYY-MM-DD format
+            
+        Returns:
+            One availability result per date, in the same order
+        """
+        return await asyncio.gather(*(self.check_availability(date) for date in dates))
     
     async def book_appointment(self, 
                              customer_name: str,
@@ -65,25 +130,24 @@ class LiveKitCalendarActions:
             Booking result
         """
         try:
-            # Combine date and time
-            datetime_str = f"{preferred_date}T{preferred_time}:00"
+            # Combine and validate date and time before calling the calendar
+            datetime_str = _parse_start(preferred_date, preferred_time)
             
             # Book the appointment
-            result = self.calendar.book_appointment(
+            result = await asyncio.to_thread(
+                self.calendar.book_appointment,
                 customer_name=customer_name,
                 customer_email=customer_email,
                 start_datetime=datetime_str,
                 appointment_type=appointment_type,
                 description=f"Appointment booked via CareSetu voice agent for {customer_name}"
             )
+            if result.get('success'):
+                self._invalidate_caches()
             
             return result
         except Exception as e:
-            return {
-                "success": False,
-                "error": str(e),
-                "message": "Failed to book appointment"
-            }
+            return _failure(_FAIL_BOOK, e)
     
     async def cancel_appointment(self, event_id: str) -> Dict[str, Any]:
         """
@@ -96,14 +160,12 @@ class LiveKitCalendarActions:
             Cancellation result
         """
         try:
-            result = self.calendar.cancel_appointment(event_id)
+            result = await asyncio.to_thread(self.calendar.cancel_appointment, event_id)
+            if result.get('success'):
+                self._invalidate_caches()
             return result
         except Exception as e:
-            return {
-                "success": False,
-                "error": str(e),
-                "message": "Failed to cancel appointment"
-            }
+            return _failure(_FAIL_CANCEL, e)
     
     async def get_upcoming_appointments(self, email: str = None) -> Dict[str, Any]:
         """
@@ -116,14 +178,14 @@ class LiveKitCalendarActions:
             List of upcoming appointments
         """
         try:
-            appointments = self.calendar.get_upcoming_appointments(days_ahead=7)
+            upcoming = await self._get_upcoming()
             
-            # Filter by email if provided
+            # Filter by email if provided (a new list, so callers never mutate the cache)
             if email:
-                appointments = [
-                    appt for appt in appointments 
-                    if email.lower() in [att.lower() for att in appt.get('attendees', [])]
-                ]
+                email = email.lower()
+                appointments = [appt for appt, attendees in upcoming if email in attendees]
+            else:
+                appointments = [appt for appt, _ in upcoming]
             
             return {
                 "success": True,
@@ -131,8 +193,26 @@ class LiveKitCalendarActions:
                 "count": len(appointments)
             }
         except Exception as e:
-            return {
-                "success": False,
-                "error": str(e),
-                "message": "Failed to retrieve appointments"
-            }
\ No newline at end of file
+            return _failure(_FAIL_UPCOMING, e)
+    
+    async def _get_upcoming(self) -> List[tuple]:
+        """Get the next week's appointments with lowercased attendees, reusing a recent listing"""
+        hit = _upcoming_cache.get(self.UPCOMING_DAYS_AHEAD)
+        if hit and time.monotonic() - hit[0] < self.UPCOMING_CACHE_TTL:
+            return hit[1]
+        
+        now = time.monotonic()
+        appointments = await asyncio.to_thread(self.calendar.get_upcoming_appointments, days_ahead=self.UPCOMING_DAYS_AHEAD)
+        upcoming = [
+            (appt, frozenset(att.lower() for att in appt.get('attendees', ())))
+            for appt in appointments
+        ]
+        # The client also returns [] on API errors, so empty listings are not cached
+        if upcoming:
+            _upcoming_cache[self.UPCOMING_DAYS_AHEAD] = (now, upcoming)
+        return upcoming
+    
+    def _invalidate_caches(self):
+        """Forget cached availability and appointments after the calendar changes"""
+        _avail_cache.clear()
+        _upcoming_cache.clear()
@@ -0,0 +1,14 @@
+"""
+Minimal stand-in for livekit.agents.llm, for testing without LiveKit
+"""
+
+
+class MockLLM:
+    class FunctionContext:
+        def __init__(self, name, description, parameters):
+            self.name = name
+            self.description = description
+            self.parameters = parameters
+
+
+llm = MockLLM()
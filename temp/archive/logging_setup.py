@@ -0,0 +1,21 @@
+"""
+Shared logging setup for the archive entry points
+Writes log records from a background thread so the event loop never waits on stderr
+"""
+
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+def configure_logging(level: int = logging.INFO) -> QueueListener:
+    """Route log records through a queue so stderr writes happen off the event loop."""
+    log_queue = queue.Queue(-1)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(QueueHandler(log_queue))
+    listener.start()
+    return listener
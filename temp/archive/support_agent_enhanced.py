@@ -6,16 +6,84 @@ Provides intelligent customer support using semantic search and RAG
 import asyncio
 import logging
 import json
+import operator
 import os
-from typing import Dict, Any, List, Optional
-from dataclasses import dataclass
-from datetime import datetime
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, List, Optional
+from dataclasses import asdict, dataclass
 
-from knowledge_base_chromadb_cloud import CloudKnowledgeBaseConnector, SearchResult
+from knowledge_base_chromadb_cloud import CloudKnowledgeBaseConnector, KnowledgeDocument, SearchResult
 from conversation_context import ConversationMemory, ContextType
 
+# Optional fast JSON encoder for prompt context and stored sessions
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Optional shared session store, so several workers can serve the same session
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+# Optional SIMD keyword scanner for large escalation keyword sets
+try:
+    import hyperscan
+    HYPERSCAN_AVAILABLE = True
+except ImportError:
+    HYPERSCAN_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# Knowledge base search settings used for every customer query
+SEARCH_MAX_RESULTS = 5
+SEARCH_MIN_SCORE = 0.2
+
+# Search results for repeated questions are reused within this window
+SEARCH_CACHE_SIZE = 4096
+SEARCH_CACHE_TTL = 600
+
+# Session bounds: idle sessions expire and only recent turns are kept
+MAX_CONVERSATION_CONTEXTS = 10_000
+CONVERSATION_CONTEXT_TTL = 3600
+MAX_HISTORY_TURNS = 16
+SESSION_STORE_MAX_CONNECTIONS = 50
+
+# Concurrent searches are coalesced within this window (seconds)
+SEARCH_BATCH_WINDOW = 0.01
+SEARCH_BATCH_SIZE = 32
+
+# Single-document writes are buffered into bulk writes
+DOCUMENT_BATCH_WINDOW = 0.5
+DOCUMENT_BATCH_SIZE = 250
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_by_score = operator.attrgetter("score")
+
+# Prompt size limits: per-source content and recent turns included
+KNOWLEDGE_CONTENT_MAX_CHARS = 400
+PROMPT_HISTORY_TURNS = 2
+# Prompts with at least this much knowledge text are built off the event loop
+PROMPT_OFFLOAD_MIN_CHARS = 2000
+
+# Company-independent instructions of the support system prompt
+_SYSTEM_PROMPT_INSTRUCTIONS = """
+
+INSTRUCTIONS:
+1. Answer based primarily on the knowledge base information provided
+2. Be conversational and helpful
+3. If the knowledge base doesn't fully answer the question, acknowledge this and offer to help further
+4. Keep responses concise but complete
+5. Use a professional but friendly tone
+6. If you need to escalate or get more information, say so clearly
+7. Reference specific policies or procedures when relevant
+"""
+
 @dataclass
 class SupportResponse:
     """Represents a support agent response with metadata."""
@@ -26,6 +94,134 @@ class SupportResponse:
     escalation_reason: Optional[str] = None
     search_results_count: int = 0
     processing_time: float = 0.0
+    # Streaming mode: reply chunks as they are generated; response is filled in once it is exhausted
+    response_stream: Optional[AsyncIterator[str]] = None
+    first_token_time: float = 0.0
+
+def _json_dumps(obj: Any) -> str:
+    """Serialize to compact JSON text, with orjson when it is installed."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, separators=(',', ':'))
+
+def _compile_hyperscan(keywords: List[str]):
+    """Compile keywords (word-start anchored, caseless) into a Hyperscan database."""
+    database = hyperscan.Database()
+    database.compile(
+        expressions=[rb"\b" + re.escape(keyword).encode() for keyword in keywords],
+        ids=list(range(len(keywords))),
+        elements=len(keywords),
+        flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH] * len(keywords)
+    )
+    return database
+
+def _hyperscan_matches(database, text: str) -> bool:
+    """Check whether any keyword compiled into the database occurs in the text."""
+    matches = []
+    database.scan(text.encode(), match_event_handler=lambda *_: matches.append(True))
+    return bool(matches)
+
+def _source_titles(search_results: List[SearchResult]) -> List[str]:
+    """Document titles of the search results, best first, without repeats."""
+    return list(dict.fromkeys(result.document.title for result in search_results))
+
+class _SimplePrompt:
+    """Prompt wrapper passed to the LLM."""
+    __slots__ = ('text',)
+    
+    def __init__(self, text: str):
+        self.text = text
+
+@dataclass
+class SimpleContext:
+    """Simple per-session conversation context."""
+    session_id: str
+    customer_phone: str = None
+    conversation_history: List[Dict[str, Any]] = None
+    escalation_count: int = 0
+    last_active: float = 0.0
+    
+    def __post_init__(self):
+        if self.conversation_history is None:
+            self.conversation_history = []
+    
+    def add_turn(self, user_message: str, agent_response: str, sources: List[str] = None):
+        turn = {
+            "timestamp": time.time(),  # epoch seconds; format only for display
+            "user_message": user_message,
+            "agent_response": agent_response,
+            "sources": sources or []
+        }
+        self.conversation_history.append(turn)
+        # Prompts only use the last few turns
+        if len(self.conversation_history) > MAX_HISTORY_TURNS:
+            del self.conversation_history[:-MAX_HISTORY_TURNS]
+
+class _MicroBatcher:
+    """
+    Coalesces items submitted by concurrent callers into one batch call,
+    issued after a short window or once the batch is full.
+    """
+    
+    def __init__(self, run_batch: Callable[[List[Any]], Awaitable[List[Any]]],
+                 window: float, max_batch: int):
+        """
+        Args:
+            run_batch: Coroutine taking the batched items and returning one result per item
+            window: Seconds to wait for more items after the first one arrives
+            max_batch: Batch size that triggers an immediate flush
+        """
+        self.run_batch = run_batch
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: List[tuple] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+    
+    async def submit(self, item: Any) -> Any:
+        """Queue an item and wait for its result from the next batch."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        
+        return await future
+    
+    def _flush(self):
+        """Send everything queued so far as one batch."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def _run(self, batch: List[tuple]):
+        """Run one batch call and resolve each caller's future."""
+        try:
+            results = await self.run_batch([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+        
+        # A short result list would otherwise leave the remaining callers waiting forever
+        if len(results) < len(batch):
+            error = RuntimeError(f"Batch call returned {len(results)} results for {len(batch)} items")
+            for _, future in batch[len(results):]:
+                if not future.done():
+                    future.set_exception(error)
 
 class EnhancedSupportAgent:
     """
@@ -38,7 +234,8 @@ class EnhancedSupportAgent:
                  llm_instance=None,
                  api_key: Optional[str] = None,
                  tenant: Optional[str] = None,
-                 database: Optional[str] = None):
+                 database: Optional[str] = None,
+                 redis_url: Optional[str] = None):
         """
         Initialize enhanced support agent.
         
@@ -48,6 +245,7 @@ class EnhancedSupportAgent:
             api_key: ChromaDB Cloud API key
             tenant: ChromaDB Cloud tenant ID
             database: ChromaDB Cloud database name
+            redis_url: Redis URL for shared session storage (defaults to REDIS_URL)
         """
         self.company_id = company_id
         self.llm = llm_instance
@@ -60,22 +258,101 @@ class EnhancedSupportAgent:
             database=database
         )
         
-        # Conversation contexts for session management
-        self.conversation_contexts: Dict[str, ConversationMemory] = {}
+        # Batch concurrent searches when the connector supports multi-query search
+        self._search_batcher = None
+        if hasattr(self.knowledge_base, "search_many"):
+            self._search_batcher = _MicroBatcher(self._search_many, SEARCH_BATCH_WINDOW, SEARCH_BATCH_SIZE)
+        
+        # Buffer for add_knowledge_document, written in bulk
+        self._document_batcher = _MicroBatcher(self._write_document_batch, DOCUMENT_BATCH_WINDOW, DOCUMENT_BATCH_SIZE)
+        
+        # Normalized query -> (fetched_at, results), least recently used first
+        self._search_cache: OrderedDict[str, tuple] = OrderedDict()
+        self._search_cache_hits = 0
+        self._search_cache_misses = 0
+        
+        # Conversation contexts for session management, least recently active first
+        self.conversation_contexts: OrderedDict[str, ConversationMemory] = OrderedDict()
+        
+        # Shared session store (pooled connections); in-memory only when not configured
+        self._session_store = None
+        redis_url = redis_url or os.getenv("REDIS_URL")
+        if redis_url and REDIS_AVAILABLE:
+            pool = aioredis.BlockingConnectionPool.from_url(
+                redis_url,
+                max_connections=SESSION_STORE_MAX_CONNECTIONS,
+                health_check_interval=30,
+                socket_timeout=5
+            )
+            self._session_store = aioredis.Redis(connection_pool=pool)
+        
+        # Fixed system prompt prefix, identical on every request so providers can cache it
+        self._system_prompt_header = (
+            f"You are a helpful customer service representative for {company_id}. Use the provided knowledge base "
+            f"information from our ChromaDB Cloud vector database to answer the customer's question accurately and "
+            f"professionally.{_SYSTEM_PROMPT_INSTRUCTIONS}\n"
+            f"Remember: You're representing {company_id}, so maintain professionalism while being genuinely helpful."
+            f"\n\nKNOWLEDGE BASE INFORMATION (from semantic search):\n"
+        )
         
         # Escalation triggers
         self.escalation_triggers = self._setup_escalation_triggers()
         
-        logger.info(f"✅ Enhanced support agent initialized for company: {company_id}")
+        logger.info("✅ Enhanced support agent initialized for company: %s", company_id)
     
     async def initialize(self):
         """Initialize the support agent by loading knowledge base."""
         await self.knowledge_base.load_knowledge_base()
+        
+        # Open the pooled connection now so the first customer search skips the TCP/TLS handshake
+        if hasattr(self.knowledge_base, "heartbeat"):
+            await self.knowledge_base.heartbeat()
         logger.info("✅ Support agent knowledge base loaded from ChromaDB Cloud")
     
+    async def close(self):
+        """Release the knowledge base client and session store connection pools."""
+        if hasattr(self.knowledge_base, "close"):
+            await self.knowledge_base.close()
+        if self._session_store is not None:
+            await self._session_store.aclose()
+            self._session_store = None
+    
+    async def _load_context(self, session_id: str, customer_phone: str = None) -> SimpleContext:
+        """Get the session context, preferring the shared store's copy when one is configured."""
+        if self._session_store is not None:
+            try:
+                data = await self._session_store.get(f"support_session:{session_id}")
+                if data:
+                    # Activity time is per process, so stamp it now or the TTL sweep drops the loaded copy
+                    conv_context = SimpleContext(**json.loads(data))
+                    conv_context.last_active = time.monotonic()
+                    self.conversation_contexts[session_id] = conv_context
+                    self.conversation_contexts.move_to_end(session_id)
+            except Exception as e:
+                logger.error("Error loading session from Redis: %s", e)
+        
+        return self.get_or_create_context(session_id, customer_phone)
+    
+    async def _save_context(self, conv_context: SimpleContext):
+        """Write the session context to the shared store, if one is configured."""
+        if self._session_store is None:
+            return
+        
+        data = asdict(conv_context)
+        # Activity time is per process; the store's own TTL handles expiry
+        data.pop("last_active", None)
+        try:
+            await self._session_store.set(
+                f"support_session:{conv_context.session_id}",
+                _json_dumps(data),
+                ex=CONVERSATION_CONTEXT_TTL
+            )
+        except Exception as e:
+            logger.error("Error saving session to Redis: %s", e)
+    
     def _setup_escalation_triggers(self) -> List[Dict[str, Any]]:
         """Set up escalation triggers for different scenarios."""
-        return [
+        triggers = [
             {
                 "type": "confidence",
                 "threshold": 0.3,
@@ -92,50 +369,59 @@ class EnhancedSupportAgent:
                 "message": "I see we've had some difficulty resolving this. Let me transfer you to our senior support team."
             }
         ]
+        
+        # One compiled matcher per keyword trigger, matched in a single scan
+        for trigger in triggers:
+            if trigger["type"] == "keywords":
+                alternation = "|".join(map(re.escape, trigger["keywords"]))
+                trigger["_pattern"] = re.compile(rf"\b(?:{alternation})")
+                if HYPERSCAN_AVAILABLE:
+                    trigger["_database"] = _compile_hyperscan(trigger["keywords"])
+        return triggers
     
     def get_or_create_context(self, session_id: str, customer_phone: str = None) -> ConversationMemory:
         """Get existing conversation context or create new one."""
+        now = time.monotonic()
+        
+        # Drop sessions idle longer than the TTL (oldest activity first)
+        cutoff = now - CONVERSATION_CONTEXT_TTL
+        while self.conversation_contexts:
+            oldest = next(iter(self.conversation_contexts.values()))
+            if oldest.last_active > cutoff:
+                break
+            self.conversation_contexts.popitem(last=False)
+        
         if session_id not in self.conversation_contexts:
-            # Create a simple conversation context for now
-            from dataclasses import dataclass
-            from typing import List, Dict, Any
-            
-            @dataclass
-            class SimpleContext:
-                session_id: str
-                customer_phone: str = None
-                conversation_history: List[Dict[str, Any]] = None
-                escalation_count: int = 0
-                
-                def __post_init__(self):
-                    if self.conversation_history is None:
-                        self.conversation_history = []
-                
-                def add_turn(self, user_message: str, agent_response: str, sources: List[str] = None):
-                    turn = {
-                        "timestamp": datetime.now().isoformat(),
-                        "user_message": user_message,
-                        "agent_response": agent_response,
-                        "sources": sources or []
-                    }
-                    self.conversation_history.append(turn)
-            
             self.conversation_contexts[session_id] = SimpleContext(
                 session_id=session_id,
                 customer_phone=customer_phone
             )
-        return self.conversation_contexts[session_id]
+            while len(self.conversation_contexts) > MAX_CONVERSATION_CONTEXTS:
+                self.conversation_contexts.popitem(last=False)
+        else:
+            self.conversation_contexts.move_to_end(session_id)
+        
+        conv_context = self.conversation_contexts[session_id]
+        conv_context.last_active = now
+        return conv_context
     
-    def should_escalate(self, query: str, confidence: float, context) -> tuple[bool, str]:
+    def should_escalate(self, query: str, confidence: float, context,
+                        query_lower: Optional[str] = None) -> tuple[bool, str]:
         """Check if conversation should be escalated to human agent."""
-        query_lower = query.lower()
+        if query_lower is None:
+            query_lower = query.lower()
         
         for trigger in self.escalation_triggers:
             if trigger["type"] == "confidence" and confidence < trigger["threshold"]:
                 return True, trigger["message"]
             
             elif trigger["type"] == "keywords":
-                if any(keyword in query_lower for keyword in trigger["keywords"]):
+                database = trigger.get("_database")
+                if database is not None:
+                    matched = _hyperscan_matches(database, query_lower)
+                else:
+                    matched = trigger["_pattern"].search(query_lower) is not None
+                if matched:
                     return True, trigger["message"]
             
             elif trigger["type"] == "escalation_count":
@@ -148,7 +434,8 @@ class EnhancedSupportAgent:
                                    query: str, 
                                    session_id: str, 
                                    customer_phone: str = None,
-                                   context: Dict[str, Any] = None) -> SupportResponse:
+                                   context: Dict[str, Any] = None,
+                                   stream: bool = False) -> SupportResponse:
         """
         Process customer query using ChromaDB Cloud semantic search and RAG.
         
@@ -157,30 +444,33 @@ class EnhancedSupportAgent:
             session_id: Unique session identifier
             customer_phone: Customer phone number
             context: Additional context information
+            stream: Return as soon as the LLM starts, with the reply in response_stream
             
         Returns:
             SupportResponse with generated response and metadata
         """
-        start_time = datetime.now()
+        start_time = time.perf_counter()
         
-        logger.info(f"🤖 Processing query for session {session_id}: '{query}'")
-        
-        # Get or create conversation context
-        conv_context = self.get_or_create_context(session_id, customer_phone)
+        logger.info("🤖 Processing query for session %s: %r", session_id, query)
         
         try:
-            # Search knowledge base using ChromaDB Cloud
-            search_results = await self.knowledge_base.search(
-                query=query,
-                max_results=5,
-                min_score=0.2
+            # Lowercased once, shared by the search cache key and the escalation scan
+            query_lower = query.lower()
+            
+            # Search knowledge base using ChromaDB Cloud, overlapping the session
+            # lookup (a Redis round trip when a shared store is configured)
+            search_results, conv_context = await asyncio.gather(
+                self._search(query, query_lower),
+                self._load_context(session_id, customer_phone)
             )
             
             # Calculate confidence from search results
-            confidence = max(result.score for result in search_results) if search_results else 0.0
+            confidence = search_results[0].score if search_results else 0.0
             
             # Check for escalation triggers
-            should_escalate, escalation_message = self.should_escalate(query, confidence, conv_context)
+            should_escalate, escalation_message = self.should_escalate(
+                query, confidence, conv_context, query_lower
+            )
             
             if should_escalate:
                 conv_context.escalation_count += 1
@@ -191,8 +481,21 @@ class EnhancedSupportAgent:
                     escalation_needed=True,
                     escalation_reason=escalation_message,
                     search_results_count=len(search_results),
-                    processing_time=(datetime.now() - start_time).total_seconds()
+                    processing_time=time.perf_counter() - start_time
                 )
+            elif stream:
+                # The turn is recorded once the caller has consumed the stream
+                response = SupportResponse(
+                    response="",
+                    confidence=confidence,
+                    sources=_source_titles(search_results),
+                    escalation_needed=False,
+                    search_results_count=len(search_results)
+                )
+                response.response_stream = self._stream_response(
+                    response, query, search_results, conv_context, context, start_time
+                )
+                return response
             else:
                 # Generate response using LLM with knowledge context
                 response_text = await self._generate_llm_response(
@@ -202,10 +505,10 @@ class EnhancedSupportAgent:
                 response = SupportResponse(
                     response=response_text,
                     confidence=confidence,
-                    sources=[result.document.title for result in search_results],
+                    sources=_source_titles(search_results),
                     escalation_needed=False,
                     search_results_count=len(search_results),
-                    processing_time=(datetime.now() - start_time).total_seconds()
+                    processing_time=time.perf_counter() - start_time
                 )
             
             # Add turn to conversation history
@@ -214,70 +517,126 @@ class EnhancedSupportAgent:
                 agent_response=response.response,
                 sources=response.sources
             )
+            await self._save_context(conv_context)
             
-            logger.info(f"✅ Generated response (confidence: {confidence:.2f}, time: {response.processing_time:.2f}s)")
+            logger.info("✅ Generated response (confidence: %.2f, time: %.2fs)", confidence, response.processing_time)
             return response
             
         except Exception as e:
-            logger.error(f"❌ Error processing query: {e}")
+            logger.error("❌ Error processing query: %s", e)
             return SupportResponse(
                 response="I apologize, but I'm experiencing technical difficulties. Let me connect you with someone who can help you directly.",
                 confidence=0.0,
                 sources=[],
                 escalation_needed=True,
                 escalation_reason=f"Technical error: {str(e)}",
-                processing_time=(datetime.now() - start_time).total_seconds()
+                processing_time=time.perf_counter() - start_time
             )
     
+    async def _search(self, query: str, query_lower: Optional[str] = None) -> List[SearchResult]:
+        """Search the knowledge base, reusing recent results for the same question."""
+        if query_lower is None:
+            query_lower = query.lower()
+        key = _WHITESPACE_RE.sub(" ", query_lower.strip())
+        hit = self._search_cache.get(key)
+        if hit and time.monotonic() - hit[0] < SEARCH_CACHE_TTL:
+            self._search_cache.move_to_end(key)
+            self._search_cache_hits += 1
+            return hit[1]
+        
+        self._search_cache_misses += 1
+        now = time.monotonic()
+        if self._search_batcher is not None:
+            results = await self._search_batcher.submit(query)
+        else:
+            results = await self.knowledge_base.search(
+                query=query,
+                max_results=SEARCH_MAX_RESULTS,
+                min_score=SEARCH_MIN_SCORE
+            )
+        
+        # Best match first, so callers can read confidence and sources off the order
+        results = sorted(results, key=_by_score, reverse=True)
+        self._search_cache[key] = (now, results)
+        self._search_cache.move_to_end(key)
+        while len(self._search_cache) > SEARCH_CACHE_SIZE:
+            self._search_cache.popitem(last=False)
+        return results
+    
+    async def _search_many(self, queries: List[str]) -> List[List[SearchResult]]:
+        """Run one multi-query search for a batch of concurrent queries."""
+        results = await self.knowledge_base.search_many(
+            queries=queries,
+            max_results=SEARCH_MAX_RESULTS,
+            min_score=SEARCH_MIN_SCORE
+        )
+        return [[r for r in query_results if r.score >= SEARCH_MIN_SCORE] for query_results in results]
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Get search result cache statistics."""
+        lookups = self._search_cache_hits + self._search_cache_misses
+        return {
+            "entries": len(self._search_cache),
+            "hits": self._search_cache_hits,
+            "misses": self._search_cache_misses,
+            "hit_rate": self._search_cache_hits / lookups if lookups else 0.0
+        }
+    
+    async def _stream_response(self, response: SupportResponse, query: str,
+                               search_results: List[SearchResult], conv_context,
+                               context: Optional[Dict[str, Any]], start_time: float) -> AsyncIterator[str]:
+        """Yield reply chunks, then complete the response and record the turn."""
+        chunks = []
+        async for chunk in self._generate_llm_response_stream(query, search_results, conv_context, context):
+            if not chunks:
+                response.first_token_time = time.perf_counter() - start_time
+            chunks.append(chunk)
+            yield chunk
+        
+        response.response = "".join(chunks).strip()
+        response.processing_time = time.perf_counter() - start_time
+        conv_context.add_turn(
+            user_message=query,
+            agent_response=response.response,
+            sources=response.sources
+        )
+        await self._save_context(conv_context)
+        
+        logger.info("✅ Streamed response (first token: %.2fs, time: %.2fs)",
+                    response.first_token_time, response.processing_time)
+    
+    async def _generate_llm_response_stream(self,
+                                            query: str,
+                                            search_results: List[SearchResult],
+                                            conv_context,
+                                            context: Dict[str, Any] = None) -> AsyncIterator[str]:
+        """Stream the LLM response token by token when the LLM supports it."""
+        if not (self.llm and hasattr(self.llm, 'astream')):
+            yield await self._generate_llm_response(query, search_results, conv_context, context)
+            return
+        
+        try:
+            prompt = _SimplePrompt(await self._build_prompt_async(query, search_results, conv_context, context))
+            async for chunk in self.llm.astream(prompt):
+                text = getattr(chunk, 'delta', None) or getattr(chunk, 'content', None)
+                if text:
+                    yield text
+        except Exception as e:
+            logger.error("❌ Error streaming LLM response: %s", e)
+            yield "I apologize, but I'm having trouble accessing our information right now. Let me connect you with someone who can help you directly."
+    
     async def _generate_llm_response(self, 
                                    query: str, 
                                    search_results: List[SearchResult], 
                                    conv_context,
                                    context: Dict[str, Any] = None) -> str:
         """Generate response using LLM with ChromaDB Cloud search results."""
-        
-        # Prepare knowledge context from search results
-        knowledge_context = self._prepare_knowledge_context(search_results)
-        
-        # Prepare conversation history
-        conversation_history = self._prepare_conversation_history(conv_context)
-        
-        # Create system prompt with enhanced context
-        system_prompt = f"""You are a helpful customer service representative for {self.company_id}. Use the provided knowledge base information from our ChromaDB Cloud vector database to answer the customer's question accurately and professionally.
-
-KNOWLEDGE BASE INFORMATION (from semantic search):
-{knowledge_context}
-
-CONVERSATION HISTORY:
-{conversation_history}
-
-INSTRUCTIONS:
-1. Answer based primarily on the knowledge base information provided
-2. Be conversational and helpful
-3. If the knowledge base doesn't fully answer the question, acknowledge this and offer to help further
-4. Keep responses concise but complete
-5. Use a professional but friendly tone
-6. If you need to escalate or get more information, say so clearly
-7. Reference specific policies or procedures when relevant
-
-CONVERSATION CONTEXT:
-{json.dumps(context or {}, indent=2)}
-
-Remember: You're representing {self.company_id}, so maintain professionalism while being genuinely helpful."""
-        
-        user_prompt = f"Customer question: {query}"
-        
         try:
             # Generate response using LLM
             if self.llm and hasattr(self.llm, 'achat'):
                 # For testing with MockLLM or similar
-                full_prompt = f"{system_prompt}\n\nUser: {user_prompt}\nAssistant:"
-                
-                class SimplePrompt:
-                    def __init__(self, text):
-                        self.text = text
-                
-                response = await self.llm.achat(SimplePrompt(full_prompt))
+                full_prompt = await self._build_prompt_async(query, search_results, conv_context, context)
+                response = await self.llm.achat(_SimplePrompt(full_prompt))
                 return response.content.strip()
             else:
                 # Fallback response when no LLM is available
@@ -288,53 +647,80 @@ Remember: You're representing {self.company_id}, so maintain professionalism whi
                     return "I don't have specific information about that in our knowledge base right now. Let me connect you with someone who can help you with that question."
             
         except Exception as e:
-            logger.error(f"❌ Error generating LLM response: {e}")
+            logger.error("❌ Error generating LLM response: %s", e)
             return "I apologize, but I'm having trouble accessing our information right now. Let me connect you with someone who can help you directly."
     
+    async def _build_prompt_async(self,
+                                  query: str,
+                                  search_results: List[SearchResult],
+                                  conv_context,
+                                  context: Dict[str, Any] = None) -> str:
+        """Build the prompt, in a worker thread when it is large enough to stall the event loop."""
+        knowledge_chars = sum(
+            min(len(result.document.content), KNOWLEDGE_CONTENT_MAX_CHARS) for result in search_results
+        )
+        if knowledge_chars < PROMPT_OFFLOAD_MIN_CHARS:
+            # The thread hop costs more than building a small prompt inline
+            return self._build_prompt(query, search_results, conv_context, context)
+        return await asyncio.to_thread(self._build_prompt, query, search_results, conv_context, context)
+    
+    def _build_prompt(self,
+                      query: str,
+                      search_results: List[SearchResult],
+                      conv_context,
+                      context: Dict[str, Any] = None) -> str:
+        """Build the full LLM prompt from search results, history and context."""
+        
+        # Prepare knowledge context from search results
+        knowledge_context = self._prepare_knowledge_context(search_results)
+        
+        # Prepare conversation history
+        conversation_history = self._prepare_conversation_history(conv_context)
+        
+        # Create system prompt: fixed prefix built once in __init__, per-turn parts after it
+        system_prompt = "".join([
+            self._system_prompt_header,
+            knowledge_context,
+            "\n\nCONVERSATION HISTORY:\n",
+            conversation_history,
+            "\n\nCONVERSATION CONTEXT:\n",
+            _json_dumps(context or {})
+        ])
+        
+        user_prompt = f"Customer question: {query}"
+        return f"{system_prompt}\n\nUser: {user_prompt}\nAssistant:"
+    
     def _prepare_knowledge_context(self, search_results: List[SearchResult]) -> str:
         """Prepare knowledge context from ChromaDB Cloud search results."""
         if not search_results:
             return "No relevant information found in the knowledge base."
         
-        context_parts = []
-        
-        for i, result in enumerate(search_results, 1):
-            doc = result.document
-            context_parts.append(f"""
-Knowledge Source {i} (Relevance Score: {result.score:.3f}, Vector Distance: {result.vector_distance:.3f}):
-Title: {doc.title}
-Category: {doc.category}
-Tags: {', '.join(doc.tags)}
-Content: {doc.content}
-Relevance: {result.relevance_explanation}
-""")
-        
-        return "\n".join(context_parts)
+        return "\n".join([
+            f"\nKnowledge Source {i} (Relevance Score: {result.score:.3f}):\n"
+            f"Title: {result.document.title}\n"
+            f"Category: {result.document.category}\n"
+            f"Tags: {', '.join(result.document.tags)}\n"
+            f"Content: {result.document.content[:KNOWLEDGE_CONTENT_MAX_CHARS]}\n"
+            for i, result in enumerate(search_results, 1)
+        ])
     
     def _prepare_conversation_history(self, conv_context) -> str:
         """Prepare conversation history for LLM context."""
         if not conv_context.conversation_history:
             return "No previous conversation history."
         
-        history_parts = []
-        # Only include last 3 turns to keep context manageable
-        recent_history = conv_context.conversation_history[-3:]
-        
-        for turn in recent_history:
-            history_parts.append(f"""
-Previous Turn:
-Customer: {turn['user_message']}
-Agent: {turn['agent_response']}
-Sources Used: {', '.join(turn['sources']) if turn['sources'] else 'None'}
-""")
-        
-        return "\n".join(history_parts)
+        # Only include the last few turns to keep context manageable
+        return "\n".join([
+            f"\nPrevious Turn:\n"
+            f"Customer: {turn['user_message']}\n"
+            f"Agent: {turn['agent_response']}\n"
+            f"Sources Used: {', '.join(turn['sources']) if turn['sources'] else 'None'}\n"
+            for turn in conv_context.conversation_history[-PROMPT_HISTORY_TURNS:]
+        ])
     
-    async def add_knowledge_document(self, title: str, content: str, category: str, tags: List[str]) -> bool:
-        """Add a new knowledge document to ChromaDB Cloud."""
-        from knowledge_base_chromadb_cloud import KnowledgeDocument
-        
-        doc = KnowledgeDocument(
+    def _knowledge_document(self, title: str, content: str, category: str, tags: List[str]) -> KnowledgeDocument:
+        """Build a knowledge document for this company."""
+        return KnowledgeDocument(
             id=f"{self.company_id}_{title.lower().replace(' ', '_')}",
             title=title,
             content=content,
@@ -342,12 +728,45 @@ Sources Used: {', '.join(turn['sources']) if turn['sources'] else 'None'}
             tags=tags,
             company_id=self.company_id
         )
+    
+    async def add_knowledge_document(self, title: str, content: str, category: str, tags: List[str]) -> bool:
+        """Add a new knowledge document to ChromaDB Cloud (buffered into bulk writes)."""
+        return await self._document_batcher.submit(self._knowledge_document(title, content, category, tags))
+    
+    async def add_knowledge_documents(self, items: List[Dict[str, Any]]) -> bool:
+        """
+        Add several knowledge documents to ChromaDB Cloud in one bulk write.
+        
+        Args:
+            items: Dicts with title, content, category and tags
+            
+        Returns:
+            True if every document was added
+        """
+        docs = [
+            self._knowledge_document(item["title"], item["content"], item["category"], item["tags"])
+            for item in items
+        ]
+        return all(await self._write_document_batch(docs))
+    
+    async def _write_document_batch(self, docs: List[KnowledgeDocument]) -> List[bool]:
+        """Write documents in one call when the connector supports it; one result per document."""
+        if hasattr(self.knowledge_base, "add_documents"):
+            added = await self.knowledge_base.add_documents(docs)
+            results = [bool(added)] * len(docs)
+        else:
+            # Overlap the per-document round trips
+            results = list(await asyncio.gather(*(self.knowledge_base.add_document(doc) for doc in docs)))
         
-        return await self.knowledge_base.add_document(doc)
+        if any(results):
+            # New content can change the answer to any cached question
+            self._search_cache.clear()
+        return results
     
     async def get_knowledge_stats(self) -> Dict[str, Any]:
         """Get statistics about the knowledge base."""
-        return await self.knowledge_base.get_cloud_stats()
+        stats = await self.knowledge_base.get_cloud_stats()
+        return {**stats, "search_cache": self.cache_stats()}
 
 # Test the enhanced support agent
 async def test_enhanced_support_agent():
@@ -2,16 +2,46 @@
 
 import asyncio
 import logging
+import re
+import time
 import uuid
-from typing import Dict, Any, Optional, List, Tuple
+from collections import defaultdict
+from types import MappingProxyType
+from typing import Dict, Any, Mapping, Optional, List, Set, Tuple
 from datetime import datetime, timedelta
 from enum import Enum
 from dataclasses import dataclass, asdict
 
 from conversation_context import ConversationContextManager, ContextType, ConversationMemory
 
+# Optional C keyword automaton; falls back to one compiled regex alternation
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# Device type -> keywords naming it, in priority order
+DEVICE_KEYWORDS = (
+    ("computer", ("computer", "laptop", "desktop")),
+    ("mobile", ("phone", "mobile", "iphone", "android")),
+    ("tablet", ("tablet",)),
+)
+# Browsers in priority order
+BROWSER_KEYWORDS = ("chrome", "firefox", "safari", "edge", "internet explorer")
+SOLUTION_WORKED_KEYWORDS = frozenset(["yes", "worked", "fixed", "resolved", "good"])
+SOLUTION_FAILED_KEYWORDS = frozenset(["no", "didn't work", "still", "not working"])
+SEVERITY_KEYWORDS = frozenset(["urgent", "critical", "emergency"])
+
+# Every keyword read from customer messages, matched as substrings in one pass
+MESSAGE_KEYWORDS = frozenset([
+    *(keyword for _, keywords in DEVICE_KEYWORDS for keyword in keywords),
+    *BROWSER_KEYWORDS, *SOLUTION_WORKED_KEYWORDS, *SOLUTION_FAILED_KEYWORDS,
+    *SEVERITY_KEYWORDS, "error", "browser"
+])
+
 class ConversationState(Enum):
     """States in support conversation flow."""
     GREETING = "greeting"
@@ -37,7 +67,7 @@ class EscalationLevel(Enum):
     TIER_2 = "tier_2"  # Specialist required
     TIER_3 = "tier_3"  # Manager/Expert required
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class EscalationRule:
     """Rule for determining when to escalate."""
     issue_categories: List[IssueCategory]
@@ -46,7 +76,7 @@ class EscalationRule:
     escalation_level: EscalationLevel
     reason: str
 
-@dataclass
+@dataclass(slots=True)
 class ConversationStep:
     """Individual step in conversation flow."""
     state: ConversationState
@@ -55,7 +85,7 @@ class ConversationStep:
     next_expected: str  # What we expect from user next
     step_description: str  # Description of current step
 
-@dataclass
+@dataclass(slots=True)
 class QualityMetrics:
     """Quality metrics for conversation analysis."""
     resolution_time: float  # Time to resolution in seconds
@@ -66,6 +96,53 @@ class QualityMetrics:
     knowledge_sources_used: int
     confidence_average: float
 
+def _flow_step(state: ConversationState, required_info: Tuple[str, ...],
+               next_expected: str, step_description: str) -> Mapping[str, Any]:
+    """Build one read-only flow template step."""
+    return MappingProxyType({
+        "state": state,
+        "required_info": required_info,
+        "next_expected": next_expected,
+        "step_description": step_description
+    })
+
+# Flow templates, shared by every session; sessions keep only their collected information
+FLOW_TEMPLATES: Dict[IssueCategory, Tuple[Mapping[str, Any], ...]] = {
+    IssueCategory.TECHNICAL: (
+        _flow_step(ConversationState.GREETING, (), "problem_description",
+                   "Greet customer and acknowledge technical issue"),
+        _flow_step(ConversationState.PROBLEM_IDENTIFICATION, ("device_type", "browser", "error_message"),
+                   "technical_details", "Identify specific technical problem"),
+        _flow_step(ConversationState.INFORMATION_GATHERING, ("steps_to_reproduce", "when_started"),
+                   "troubleshooting_info", "Gather detailed troubleshooting information"),
+        _flow_step(ConversationState.SOLUTION_PROVIDING, (), "solution_feedback",
+                   "Provide step-by-step solution"),
+        _flow_step(ConversationState.VERIFICATION, (), "verification_response",
+                   "Verify solution worked"),
+    ),
+    IssueCategory.BILLING: (
+        _flow_step(ConversationState.GREETING, (), "billing_question",
+                   "Greet customer and acknowledge billing inquiry"),
+        _flow_step(ConversationState.PROBLEM_IDENTIFICATION, ("account_number", "billing_period", "issue_description"),
+                   "billing_details", "Identify specific billing issue"),
+        _flow_step(ConversationState.SOLUTION_PROVIDING, (), "solution_acceptance",
+                   "Provide billing resolution"),
+        _flow_step(ConversationState.VERIFICATION, (), "satisfaction_confirmation",
+                   "Confirm billing issue resolved"),
+    ),
+    # General support flow, also used for every other category
+    IssueCategory.GENERAL: (
+        _flow_step(ConversationState.GREETING, (), "customer_inquiry",
+                   "Greet customer and understand inquiry"),
+        _flow_step(ConversationState.PROBLEM_IDENTIFICATION, ("issue_description",),
+                   "problem_details", "Identify customer's specific need"),
+        _flow_step(ConversationState.SOLUTION_PROVIDING, (), "solution_feedback",
+                   "Provide appropriate solution or information"),
+        _flow_step(ConversationState.VERIFICATION, (), "final_confirmation",
+                   "Ensure customer needs are met"),
+    ),
+}
+
 class SupportConversationFlows:
     """
     Manages multi-step support conversation flows with context awareness.
@@ -90,6 +167,25 @@ class SupportConversationFlows:
         # Escalation rules matrix
         self.escalation_rules = self._initialize_escalation_rules()
         
+        # Lowercased trigger keyword -> indexes of the escalation rules it fires
+        self._keyword_rules: Dict[str, List[int]] = defaultdict(list)
+        for index, rule in enumerate(self.escalation_rules):
+            for keyword in rule.trigger_keywords:
+                self._keyword_rules[keyword.lower()].append(index)
+        keywords = MESSAGE_KEYWORDS | self._keyword_rules.keys()
+        
+        # One automaton over all message and trigger keywords, so a single pass finds every hit
+        self._automaton = None
+        if AHOCORASICK_AVAILABLE:
+            self._automaton = ahocorasick.Automaton()
+            for keyword in keywords:
+                self._automaton.add_word(keyword, keyword)
+            self._automaton.make_automaton()
+        else:
+            # Lookahead keeps overlapping hits; a keyword only hides a same-group prefix ("no" in "not working")
+            alternation = "|".join(map(re.escape, sorted(keywords, key=len, reverse=True)))
+            self._keyword_pattern = re.compile(rf"(?=({alternation}))")
+        
         logger.info("✅ Support Conversation Flows initialized")
     
     def _initialize_escalation_rules(self) -> List[EscalationRule]:
@@ -156,10 +252,15 @@ class SupportConversationFlows:
             "issue_category": issue_category,
             "current_state": ConversationState.GREETING,
             "current_step_index": 0,
-            "steps": self._get_flow_template(issue_category),
+            # Per-session steps reference the shared template; collected_info is created on first write
+            "steps": [
+                {"template": template, "collected_info": None}
+                for template in self._get_flow_template(issue_category)
+            ],
             "escalation_count": 0,
             "solution_attempts": 0,
-            "started_at": datetime.now(),
+            # Monotonic seconds, only used for elapsed-time arithmetic
+            "started_at": time.monotonic(),
             "resolved": False
         }
         
@@ -179,111 +280,15 @@ class SupportConversationFlows:
         # Process the initial message
         return await self.process_step(session_id, user_message, context)
     
-    def _get_flow_template(self, issue_category: IssueCategory) -> List[Dict[str, Any]]:
+    def _get_flow_template(self, issue_category: IssueCategory) -> Tuple[Mapping[str, Any], ...]:
         """Get conversation flow template based on issue category."""
-        
-        if issue_category == IssueCategory.TECHNICAL:
-            return [
-                {
-                    "state": ConversationState.GREETING,
-                    "required_info": [],
-                    "collected_info": {},
-                    "next_expected": "problem_description",
-                    "step_description": "Greet customer and acknowledge technical issue"
-                },
-                {
-                    "state": ConversationState.PROBLEM_IDENTIFICATION,
-                    "required_info": ["device_type", "browser", "error_message"],
-                    "collected_info": {},
-                    "next_expected": "technical_details",
-                    "step_description": "Identify specific technical problem"
-                },
-                {
-                    "state": ConversationState.INFORMATION_GATHERING,
-                    "required_info": ["steps_to_reproduce", "when_started"],
-                    "collected_info": {},
-                    "next_expected": "troubleshooting_info",
-                    "step_description": "Gather detailed troubleshooting information"
-                },
-                {
-                    "state": ConversationState.SOLUTION_PROVIDING,
-                    "required_info": [],
-                    "collected_info": {},
-                    "next_expected": "solution_feedback",
-                    "step_description": "Provide step-by-step solution"
-                },
-                {
-                    "state": ConversationState.VERIFICATION,
-                    "required_info": [],
-                    "collected_info": {},
-                    "next_expected": "verification_response",
-                    "step_description": "Verify solution worked"
-                }
-            ]
-        
-        elif issue_category == IssueCategory.BILLING:
-            return [
-                {
-                    "state": ConversationState.GREETING,
-                    "required_info": [],
-                    "collected_info": {},
-                    "next_expected": "billing_question",
-                    "step_description": "Greet customer and acknowledge billing inquiry"
-                },
-                {
-                    "state": ConversationState.PROBLEM_IDENTIFICATION,
-                    "required_info": ["account_number", "billing_period", "issue_description"],
-                    "collected_info": {},
-                    "next_expected": "billing_details",
-                    "step_description": "Identify specific billing issue"
-                },
-                {
-                    "state": ConversationState.SOLUTION_PROVIDING,
-                    "required_info": [],
-                    "collected_info": {},
-                    "next_expected": "solution_acceptance",
-                    "step_description": "Provide billing resolution"
-                },
-                {
-                    "state": ConversationState.VERIFICATION,
-                    "required_info": [],
-                    "collected_info": {},
-                    "next_expected": "satisfaction_confirmation",
-                    "step_description": "Confirm billing issue resolved"
-                }
-            ]
-        
-        else:  # General support flow
-            return [
-                {
-                    "state": ConversationState.GREETING,
-                    "required_info": [],
-                    "collected_info": {},
-                    "next_expected": "customer_inquiry",
-                    "step_description": "Greet customer and understand inquiry"
-                },
-                {
-                    "state": ConversationState.PROBLEM_IDENTIFICATION,
-                    "required_info": ["issue_description"],
-                    "collected_info": {},
-                    "next_expected": "problem_details",
-                    "step_description": "Identify customer's specific need"
-                },
-                {
-                    "state": ConversationState.SOLUTION_PROVIDING,
-                    "required_info": [],
-                    "collected_info": {},
-                    "next_expected": "solution_feedback",
-                    "step_description": "Provide appropriate solution or information"
-                },
-                {
-                    "state": ConversationState.VERIFICATION,
-                    "required_info": [],
-                    "collected_info": {},
-                    "next_expected": "final_confirmation",
-                    "step_description": "Ensure customer needs are met"
-                }
-            ]
+        return FLOW_TEMPLATES.get(issue_category, FLOW_TEMPLATES[IssueCategory.GENERAL])
+    
+    def _collected_info(self, step: Dict[str, Any]) -> Dict[str, Any]:
+        """Get a step's collected information, creating it on first write."""
+        if step["collected_info"] is None:
+            step["collected_info"] = {}
+        return step["collected_info"]
     
     async def process_step(self, session_id: str, user_message: str,
                          context: Dict[str, Any]) -> Dict[str, Any]:
@@ -305,7 +310,7 @@ class SupportConversationFlows:
         
         flow_state = self.active_flows[session_id]
         current_step = flow_state["steps"][flow_state["current_step_index"]]
-        state = ConversationState(current_step["state"])
+        state = ConversationState(current_step["template"]["state"])
         
         # Process based on current conversation state
         if state == ConversationState.GREETING:
@@ -368,21 +373,23 @@ class SupportConversationFlows:
         
         flow_state = self.active_flows[session_id]
         current_step = flow_state["steps"][flow_state["current_step_index"]]
+        found = self._scan_keywords(user_message.lower())
         
         # Extract information from user message
-        extracted_info = await self._extract_information(user_message, current_step["required_info"])
+        extracted_info = await self._extract_information(user_message, current_step["template"]["required_info"], found)
         
         # Update collected information
-        current_step["collected_info"].update(extracted_info)
+        collected_info = self._collected_info(current_step)
+        collected_info.update(extracted_info)
         
         # Analyze problem description
-        problem_analysis = await self._analyze_problem_description(user_message, flow_state["issue_category"])
+        problem_analysis = await self._analyze_problem_description(user_message, flow_state["issue_category"], found)
         
         # Generate targeted follow-up questions based on issue category
         if flow_state["issue_category"] == IssueCategory.TECHNICAL:
-            if "error" in user_message.lower():
+            if "error" in found:
                 follow_up = "Can you describe the exact error message you're seeing and when this issue first appeared?"
-            elif "browser" in user_message.lower():
+            elif "browser" in found:
                 follow_up = "Which web browser are you using? For example, Chrome, Safari, Firefox, or Edge?"
             else:
                 follow_up = "To help troubleshoot this, I need to know: What device are you using, and does this happen every time or only sometimes?"
@@ -403,7 +410,7 @@ class SupportConversationFlows:
             "confidence": 0.8,
             "escalation_needed": False,
             "problem_analysis": problem_analysis,
-            "collected_info": current_step["collected_info"],
+            "collected_info": collected_info,
             "session_id": session_id,
             "current_step": flow_state["current_step_index"],
             "total_steps": len(flow_state["steps"])
@@ -417,13 +424,15 @@ class SupportConversationFlows:
         current_step = flow_state["steps"][flow_state["current_step_index"]]
         
         # Extract information from user message
-        extracted_info = await self._extract_information(user_message, current_step["required_info"])
-        current_step["collected_info"].update(extracted_info)
+        required_info = current_step["template"]["required_info"]
+        extracted_info = await self._extract_information(user_message, required_info)
+        collected_info = self._collected_info(current_step)
+        collected_info.update(extracted_info)
         
         # Check what information is still missing
         missing_info = []
-        for required in current_step["required_info"]:
-            if required not in current_step["collected_info"] or not current_step["collected_info"][required]:
+        for required in required_info:
+            if required not in collected_info or not collected_info[required]:
                 missing_info.append(required)
         
         if missing_info:
@@ -458,7 +467,7 @@ class SupportConversationFlows:
                 "sources_used": [],
                 "confidence": 0.9,
                 "escalation_needed": False,
-                "collected_info": current_step["collected_info"],
+                "collected_info": collected_info,
                 "session_id": session_id,
                 "current_step": flow_state["current_step_index"],
                 "total_steps": len(flow_state["steps"])
@@ -472,9 +481,10 @@ class SupportConversationFlows:
         current_step = flow_state["steps"][flow_state["current_step_index"]]
         
         # Get collected information from previous steps
-        collected_info = current_step["collected_info"]
+        collected_info = self._collected_info(current_step)
         for step in flow_state["steps"][:flow_state["current_step_index"]]:
-            collected_info.update(step["collected_info"])
+            if step["collected_info"]:
+                collected_info.update(step["collected_info"])
         
         # Generate contextual solution based on collected information
         solution = await self._generate_contextual_solution(collected_info, flow_state["issue_category"])
@@ -503,14 +513,15 @@ class SupportConversationFlows:
         
         flow_state = self.active_flows[session_id]
         escalation_needed = False
+        found = self._scan_keywords(user_message.lower())
         
         # Check if solution worked
-        if any(word in user_message.lower() for word in ["yes", "worked", "fixed", "resolved", "good"]):
+        if not found.isdisjoint(SOLUTION_WORKED_KEYWORDS):
             # Solution successful
             await self._mark_conversation_resolved(session_id, True)
             response = "Great! I'm glad that resolved your issue. Is there anything else I can help you with today?"
         
-        elif any(word in user_message.lower() for word in ["no", "didn't work", "still", "not working"]):
+        elif not found.isdisjoint(SOLUTION_FAILED_KEYWORDS):
             # Solution didn't work
             escalation_needed = True
             response = "I understand the solution didn't work. Let me try a different approach or connect you with a specialist who can provide additional help."
@@ -520,7 +531,7 @@ class SupportConversationFlows:
             response = "Did that solution work for you? Please let me know if your issue is resolved or if you need additional assistance."
         
         # Update quality metrics
-        await self._update_quality_metrics(session_id, {"solution_successful": "yes" in user_message.lower()})
+        await self._update_quality_metrics(session_id, {"solution_successful": "yes" in found})
         
         return {
             "response": response,
@@ -550,43 +561,59 @@ class SupportConversationFlows:
             "conversation_summary": conversation_summary
         }
     
-    async def _extract_information(self, message: str, required_info: List[str]) -> Dict[str, Any]:
+    def _scan_keywords(self, message_lower: str) -> Set[str]:
+        """
+        Find every message keyword in a lowercased message in one pass.
+        
+        Args:
+            message_lower: Lowercased customer message
+            
+        Returns:
+            The distinct keywords found
+        """
+        if self._automaton is not None:
+            return {keyword for _, keyword in self._automaton.iter(message_lower)}
+        return {match.group(1) for match in self._keyword_pattern.finditer(message_lower)}
+    
+    async def _extract_information(self, message: str, required_info: List[str],
+                                   found: Optional[Set[str]] = None) -> Dict[str, Any]:
         """Extract required information from user message."""
         
         extracted = {}
-        message_lower = message.lower()
+        if found is None:
+            found = self._scan_keywords(message.lower())
         
         # Simple extraction logic (in production, use NLP)
         for info_type in required_info:
             if info_type == "device_type":
-                if any(device in message_lower for device in ["computer", "laptop", "desktop"]):
-                    extracted[info_type] = "computer"
-                elif any(device in message_lower for device in ["phone", "mobile", "iphone", "android"]):
-                    extracted[info_type] = "mobile"
-                elif "tablet" in message_lower:
-                    extracted[info_type] = "tablet"
+                for device_type, keywords in DEVICE_KEYWORDS:
+                    if not found.isdisjoint(keywords):
+                        extracted[info_type] = device_type
+                        break
             
             elif info_type == "browser":
-                browsers = ["chrome", "firefox", "safari", "edge", "internet explorer"]
-                for browser in browsers:
-                    if browser in message_lower:
+                for browser in BROWSER_KEYWORDS:
+                    if browser in found:
                         extracted[info_type] = browser
                         break
             
             elif info_type == "error_message":
-                if "error" in message_lower:
+                if "error" in found:
                     extracted[info_type] = message  # In production, extract specific error
         
         return extracted
     
-    async def _analyze_problem_description(self, message: str, issue_category: IssueCategory) -> Dict[str, Any]:
+    async def _analyze_problem_description(self, message: str, issue_category: IssueCategory,
+                                           found: Optional[Set[str]] = None) -> Dict[str, Any]:
         """Analyze problem description and return analysis."""
         
         message_lower = message.lower()
+        if found is None:
+            found = self._scan_keywords(message_lower)
         
         return {
-            "keywords": message.lower().split(),
-            "severity": "high" if any(word in message_lower for word in ["urgent", "critical", "emergency"]) else "medium",
+            "keywords": message_lower.split(),
+            "severity": "high" if not found.isdisjoint(SEVERITY_KEYWORDS) else "medium",
             "complexity": "complex" if len(message.split()) > 20 else "standard",
             "category": issue_category.value
         }
@@ -620,8 +647,8 @@ class SupportConversationFlows:
     def _is_step_complete(self, step: Dict[str, Any]) -> bool:
         """Check if current step has collected all required information."""
         
-        required_info = step["required_info"]
-        collected_info = step["collected_info"]
+        required_info = step["template"]["required_info"]
+        collected_info = step["collected_info"] or {}
         
         # Check if all required information is collected
         for required in required_info:
@@ -654,14 +681,12 @@ class SupportConversationFlows:
         
         flow_state = self.active_flows[session_id]
         flow_state["resolved"] = resolved
-        flow_state["ended_at"] = datetime.now()
+        flow_state["ended_at"] = time.monotonic()
         
         # Update quality metrics
         if session_id in self.quality_metrics:
             metrics = self.quality_metrics[session_id]
-            start_time = datetime.fromisoformat(flow_state.get("started_at", datetime.now()).isoformat())
-            end_time = datetime.now()
-            metrics.resolution_time = (end_time - start_time).total_seconds()
+            metrics.resolution_time = flow_state["ended_at"] - flow_state["started_at"]
             
             quality_score = self._calculate_quality_score(flow_state)
             metrics.customer_satisfaction = quality_score
@@ -692,15 +717,21 @@ class SupportConversationFlows:
         
         user_message_lower = user_message.lower()
         
+        # Rules whose trigger keywords appear in the message, from one scan
+        found = self._scan_keywords(user_message_lower)
+        keyword_rules = {
+            index for keyword in found & self._keyword_rules.keys() for index in self._keyword_rules[keyword]
+        }
+        issue_category = IssueCategory(flow_state["issue_category"])
+        
         # Check escalation rules
-        for rule in self.escalation_rules:
+        for index, rule in enumerate(self.escalation_rules):
             # Check if issue category matches
-            issue_category = IssueCategory(flow_state["issue_category"])
             if issue_category not in rule.issue_categories and IssueCategory.GENERAL not in rule.issue_categories:
                 continue
             
             # Check keyword triggers
-            if any(keyword.lower() in user_message_lower for keyword in rule.trigger_keywords):
+            if index in keyword_rules:
                 return True, f"Rule trigger: {rule.reason}"
             
             # Check conditional conditions
@@ -708,8 +739,8 @@ class SupportConversationFlows:
                 return True, f"Rule trigger: {rule.reason}"
         
         # Check step-specific escalation triggers
-        if "escalation_triggers" in current_step:
-            for trigger in current_step["escalation_triggers"]:
+        if "escalation_triggers" in current_step["template"]:
+            for trigger in current_step["template"]["escalation_triggers"]:
                 if trigger.lower() in user_message_lower:
                     return True, f"Step trigger: {trigger}"
         
@@ -824,15 +855,10 @@ class SupportConversationFlows:
     def _calculate_duration(self, flow_state: Dict[str, Any]) -> float:
         """Calculate conversation duration in seconds."""
         
-        start_time = flow_state.get("started_at")
-        end_time = flow_state.get("ended_at", datetime.now())
-        
-        if isinstance(start_time, str):
-            start_time = datetime.fromisoformat(start_time)
-        if isinstance(end_time, str):
-            end_time = datetime.fromisoformat(end_time)
-        
-        return (end_time - start_time).total_seconds()
+        end_time = flow_state.get("ended_at")
+        if end_time is None:
+            end_time = time.monotonic()
+        return end_time - flow_state["started_at"]
     
     async def get_all_active_flows(self) -> List[Dict[str, Any]]:
         """Get all active conversation flows."""
@@ -0,0 +1,97 @@
+"""
+Test that intent keyword matching counts substring hits the same way on every matcher path
+"""
+
+import asyncio
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'temp', 'archive'))
+
+pytest.importorskip("livekit")
+import intent_router
+from intent_router import IntentRouter, SCHEDULING_ACTION_KEYWORDS, GREETING_KEYWORDS, _INTENT_SLOT_START
+
+
+def expected_hits(router, text_lower):
+    """Reference counts: plain `keyword in text` per group, as the original keyword loop did"""
+    groups = [
+        SCHEDULING_ACTION_KEYWORDS["cancel"], SCHEDULING_ACTION_KEYWORDS["reschedule"],
+        SCHEDULING_ACTION_KEYWORDS["availability"], GREETING_KEYWORDS,
+        *router.intent_keywords.values()
+    ]
+    return [sum(1 for keyword in set(group) if keyword in text_lower) for group in groups]
+
+
+def sample_messages(router):
+    """Fixed regression messages plus random keyword mash-ups with overlaps"""
+    messages = [
+        "what is the cancellation policy?",
+        "i need to reschedule my appointment",
+        "this is about my bill",
+        "hello, good morning",
+        "can't log in, nothing is working",
+        "please connect me to a human representative",
+        "",
+    ]
+    keywords = sorted(router._keyword_groups)
+    rng = random.Random(7)
+    for _ in range(2000):
+        words = rng.choices(keywords + ["x", "ing", "re", "s"], k=rng.randint(1, 6))
+        messages.append(rng.choice(["", " "]).join(words))
+    return messages
+
+
+def check_parity(router):
+    for message in sample_messages(router):
+        assert router._keyword_hits(message) == expected_hits(router, message), message
+
+
+def test_regex_fallback_matches_substring_semantics(monkeypatch):
+    monkeypatch.setattr(intent_router, "AHOCORASICK_AVAILABLE", False)
+    router = IntentRouter(llm_instance=None)
+    assert router._automaton is None
+    check_parity(router)
+
+    # "cancel" inside "cancellation" still counts toward scheduling
+    hits = router._keyword_hits("what is the cancellation policy?")
+    scheduling_slot = _INTENT_SLOT_START + router._slot_intents.index(intent_router.IntentType.SCHEDULING)
+    assert hits[scheduling_slot] > 0
+
+
+def test_automaton_matches_substring_semantics():
+    pytest.importorskip("ahocorasick")
+    router = IntentRouter(llm_instance=None)
+    assert router._automaton is not None
+    check_parity(router)
+
+
+def baseline_keyword_intent(router, user_text):
+    """The original detect_intent keyword loop; None when no keyword matched"""
+    user_text_lower = user_text.lower()
+    keyword_scores = {}
+    for intent, keywords in router.intent_keywords.items():
+        score = sum(1 for keyword in keywords if keyword in user_text_lower)
+        if score > 0:
+            keyword_scores[intent] = score
+    if keyword_scores:
+        return max(keyword_scores.items(), key=lambda x: x[1])[0]
+    return None
+
+
+@pytest.mark.parametrize("use_automaton", [False, True])
+def test_detect_intent_matches_original_keyword_loop(monkeypatch, use_automaton):
+    if use_automaton:
+        pytest.importorskip("ahocorasick")
+    else:
+        monkeypatch.setattr(intent_router, "AHOCORASICK_AVAILABLE", False)
+    router = IntentRouter(llm_instance=None)
+
+    for message in sample_messages(router):
+        expected = baseline_keyword_intent(router, message)
+        if expected is None:
+            continue
+        assert asyncio.run(router.detect_intent(message, {})) == expected, message
@@ -0,0 +1,105 @@
+"""
+Test that support sessions survive a round trip through the shared session store
+"""
+
+import asyncio
+import importlib
+import os
+import sys
+import types
+from dataclasses import dataclass, field
+from typing import List
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'temp', 'archive'))
+
+
+@dataclass
+class KnowledgeDocument:
+    id: str
+    title: str
+    content: str
+    category: str
+    tags: List[str] = field(default_factory=list)
+    company_id: str = ""
+
+
+@dataclass
+class SearchResult:
+    document: KnowledgeDocument
+    score: float
+
+
+class CloudKnowledgeBaseConnector:
+    """Offline stand-in for the ChromaDB Cloud connector"""
+
+    def __init__(self, **kwargs):
+        pass
+
+    async def search(self, query, max_results, min_score):
+        return []
+
+
+@pytest.fixture
+def support_agent_module(monkeypatch):
+    """Import support_agent_enhanced against stub knowledge base and context modules"""
+    knowledge_base = types.ModuleType("knowledge_base_chromadb_cloud")
+    knowledge_base.CloudKnowledgeBaseConnector = CloudKnowledgeBaseConnector
+    knowledge_base.KnowledgeDocument = KnowledgeDocument
+    knowledge_base.SearchResult = SearchResult
+    conversation_context = types.ModuleType("conversation_context")
+    conversation_context.ConversationMemory = object
+    conversation_context.ContextType = object
+
+    monkeypatch.setitem(sys.modules, "knowledge_base_chromadb_cloud", knowledge_base)
+    monkeypatch.setitem(sys.modules, "conversation_context", conversation_context)
+    monkeypatch.delitem(sys.modules, "support_agent_enhanced", raising=False)
+    return importlib.import_module("support_agent_enhanced")
+
+
+class FakeSessionStore:
+    """In-memory stand-in for the Redis client, shared by several agents"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def aclose(self):
+        pass
+
+
+def test_session_round_trips_across_agents(monkeypatch, support_agent_module):
+    # A host up for longer than the context TTL
+    monkeypatch.setattr(support_agent_module.time, "monotonic", lambda: 100000.0)
+    store = FakeSessionStore()
+
+    async def run():
+        worker_a = support_agent_module.EnhancedSupportAgent("acme")
+        worker_b = support_agent_module.EnhancedSupportAgent("acme")
+        worker_a._session_store = store
+        worker_b._session_store = store
+
+        context = await worker_a._load_context("session-1", "+1234567890")
+        context.add_turn("How do I book?", "Pick a slot.")
+        context.escalation_count = 1
+        await worker_a._save_context(context)
+
+        loaded_b = await worker_b._load_context("session-1")
+        loaded_b.add_turn("And cancel?", "Call us.")
+        await worker_b._save_context(loaded_b)
+
+        reloaded_a = await worker_a._load_context("session-1")
+        return loaded_b, reloaded_a
+
+    loaded_b, reloaded_a = asyncio.run(run())
+
+    assert loaded_b.customer_phone == "+1234567890"
+    assert loaded_b.escalation_count == 1
+    assert len(reloaded_a.conversation_history) == 2
+    assert reloaded_a.escalation_count == 1